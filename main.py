@@ -10,12 +10,79 @@ import os
 import sys
 import time
 import logging
+import atexit
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# 添加src目录到Python路径
-sys.path.append(str(Path(__file__).parent / "src"))
+try:
+    import readline  # 启用input()的行编辑和历史记录（Windows等平台可能不可用）
+except ImportError:
+    readline = None
 
-from config_manager import ConfigManager
+from src.config_manager import ConfigManager
+from src.embedding_model import EmbeddingModel
+from src.retriever import RAGRetriever
+from src.document_processor import MarkdownDocumentProcessor
+from src.chat_service import ChatService
+
+# 交互式问答的输入提示符
+QUESTION_PROMPT = "\n🤔 请输入您的问题: "
+
+# 问答历史记录文件
+HISTORY_FILE = Path.home() / ".rag_history"
+HISTORY_LENGTH = 1000
+
+# 流式回答的最长刷新间隔（秒），在保证实时感的同时减少逐token刷新的系统调用
+STREAM_FLUSH_INTERVAL = 0.05
+
+def _flush_output(buffer: list):
+    """将缓冲的流式输出一次性写入标准输出并刷新"""
+    if buffer:
+        sys.stdout.write(''.join(buffer))
+        buffer.clear()
+    sys.stdout.flush()
+
+def _setup_readline():
+    """加载问答历史记录，并在程序退出时保存（readline不可用时跳过）"""
+    if readline is None:
+        return
+    try:
+        readline.read_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+    readline.set_history_length(HISTORY_LENGTH)
+    atexit.register(_save_history)
+
+def _save_history():
+    """保存问答历史记录"""
+    try:
+        readline.write_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+
+def _iter_chunks(doc_processor, documents_dir: Path):
+    """
+    并行处理文档目录中的Markdown文件并依次产出分块
+    
+    以生成器形式提供分块，配合VectorStore.build_index_batched使用。
+    文件读取和分块在进程池中并行执行（绕开GIL），结果按文件顺序产出，
+    保证每次构建的索引顺序一致。
+    
+    Args:
+        doc_processor: 文档处理器实例
+        documents_dir (Path): 文档目录
+    
+    Yields:
+        DocumentChunk: 文档分块
+    """
+    doc_files = sorted(documents_dir.glob("*.md"))
+    
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(doc_processor.process_document, [str(f) for f in doc_files])
+        for doc_file, chunks in zip(doc_files, results):
+            print(f"  ✓ {doc_file.name}: {len(chunks)} 个分块")
+            yield from chunks
 
 def setup_logging(log_level: str = "INFO"):
     """
@@ -43,11 +110,12 @@ def setup_logging(log_level: str = "INFO"):
         - 日志文件会在程序运行目录下创建
         - 如果文件已存在，新日志会追加到文件末尾
         - 控制台输出便于实时监控程序运行状态
-        - 建议在程序启动时首先调用此函数
-        - 可以通过配置文件动态调整日志级别
+        - 配置加载完成后调用一次，日志级别取自配置文件
+        - 重复调用会关闭并替换根日志器上已有的处理器，不会重复打开日志文件
     """
     numeric_level = getattr(logging, log_level.upper(), logging.INFO)
     logging.basicConfig(
+        force=True,
         level=numeric_level,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
@@ -108,8 +176,8 @@ def main():
     print("🚀 RAG学习系统启动中...")
     print("=" * 50)
     
-    # 初始化日志（使用默认级别）
-    setup_logging()
+    # 配置加载前仅启用最简日志，确保加载错误能够输出
+    logging.basicConfig(level=logging.WARNING)
     logger = logging.getLogger(__name__)
     
     try:
@@ -118,9 +186,8 @@ def main():
         config_manager = ConfigManager()
         config = config_manager.load_config()
         
-        # 重新设置日志级别（基于配置）
+        # 基于配置完成日志设置
         setup_logging(config.system['log_level'])
-        logger = logging.getLogger(__name__)
         
         # 显示配置摘要
         print("📋 配置摘要:")
@@ -132,17 +199,16 @@ def main():
         # 2. 初始化各个模块
         logger.info("开始初始化系统模块...")
         
-        # 导入模块
-        from src.embedding_model import EmbeddingModel
-        from src.retriever import RAGRetriever
-        from src.document_processor import MarkdownDocumentProcessor
-        from src.chat_service import ChatService
-        
         # 初始化嵌入模型
         print("🔧 初始化嵌入模型...")
         embedding_model = EmbeddingModel(
             model_name=config.embedding['model_name'],
-            device=config.embedding['device']
+            device=config.embedding['device'],
+            batch_size=config.embedding['batch_size'],
+            quantize=config.embedding['quantize'],
+            num_threads=config.embedding['num_threads'],
+            bf16=config.embedding['bf16'],
+            cache_dir=config.paths['cache'] if config.system['cache_enabled'] else None
         )
         embedding_model.load_model()
         
@@ -162,18 +228,17 @@ def main():
         if documents_dir.exists() and any(documents_dir.glob("*.md")):
             print("📚 发现文档，开始处理和索引构建...")
             
-            # 处理所有markdown文档
-            all_chunks = []
-            for doc_file in documents_dir.glob("*.md"):
-                logger.info(f"处理文档: {doc_file}")
-                chunks = doc_processor.process_document(str(doc_file))
-                all_chunks.extend(chunks)
-                print(f"  ✓ {doc_file.name}: {len(chunks)} 个分块")
+            # 逐个处理markdown文档，边分块边分批构建索引
+            chunk_iter = _iter_chunks(doc_processor, documents_dir)
+            first_chunk = next(chunk_iter, None)
             
-            # 构建索引
-            if all_chunks:
-                print(f"🏗️  构建向量索引 ({len(all_chunks)} 个分块)...")
-                retriever.vector_store.build_index(all_chunks)
+            if first_chunk is not None:
+                print("🏗️  构建向量索引...")
+                chunk_count = retriever.vector_store.build_index_batched(
+                    itertools.chain([first_chunk], chunk_iter),
+                    batch_size=config.embedding['batch_size']
+                )
+                print(f"✅ 向量索引构建完成 ({chunk_count} 个分块)")
                 
                 # 保存索引
                 index_path = "data/vectors/main_index"
@@ -205,10 +270,12 @@ def main():
         print("💡 输入 'help' 查看帮助信息")
         print("-" * 50)
         
+        _setup_readline()
+        
         while True:
             try:
                 # 获取用户输入
-                question = input("\n🤔 请输入您的问题: ").strip()
+                question = input(QUESTION_PROMPT).strip()
                 
                 if not question:
                     continue
@@ -240,6 +307,8 @@ def main():
                 sources = []
                 confidence = 0.0
                 full_answer = ""
+                output_buffer = []
+                last_flush = time.monotonic()
                 response_time = 0.0
                 error_msg = None
                 
@@ -252,16 +321,23 @@ def main():
                             confidence = chunk_data['confidence']
                         elif chunk_data['type'] == 'chunk':
                             content = chunk_data['content']
-                            print(content, end='', flush=True)  # 实时显示文本块
                             full_answer += content
+                            output_buffer.append(content)
+                            # 遇到换行或超过刷新间隔时输出，兼顾实时显示与系统调用次数
+                            now = time.monotonic()
+                            if '\n' in content or now - last_flush >= STREAM_FLUSH_INTERVAL:
+                                _flush_output(output_buffer)
+                                last_flush = now
                         elif chunk_data['type'] == 'end':
                             response_time = chunk_data['response_time']
                         elif chunk_data['type'] == 'error':
                             error_msg = chunk_data['error']
+                            _flush_output(output_buffer)
                             if 'content' in chunk_data:
                                 print(chunk_data['content'])
                             break
                     
+                    _flush_output(output_buffer)
                     print()  # 换行
                     
                     # 显示元信息
@@ -275,6 +351,7 @@ def main():
                         print(f"⚠️  警告: {error_msg}")
                         
                 except Exception as e:
+                    _flush_output(output_buffer)
                     print(f"\n❌ 流式输出错误: {e}")
                     print("💡 请检查网络连接或稍后重试")
                 
@@ -7,30 +7,63 @@
 
 import logging
 import time
-from typing import List, Optional, Dict, Any, Generator
-from openai import OpenAI
+from typing import List, Optional, Dict, Any, Generator, Tuple, TYPE_CHECKING
 
 from .config_manager import ConfigManager
-from .retriever import RAGRetriever
+from .semantic_cache import SemanticCache
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from .retriever import RAGRetriever
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 进程内共享的API客户端，键为(api_key, base_url)，复用底层HTTP连接池
+_CLIENT_CACHE: Dict[Tuple[str, str], "OpenAI"] = {}
+
+# 建立连接失败时由HTTP传输层重试的次数（仅重试连接阶段，不会重放已发送的请求）
+_CONNECT_RETRIES = 3
+
+# RAG提示词模板，预先拆分为固定片段，构建时直接拼接上下文和问题
+_PROMPT_HEAD = """你是一个专业的AI助手，请基于以下提供的知识库内容来回答用户的问题。
+
+知识库内容：
+"""
+_PROMPT_MID = """
+
+用户问题："""
+_PROMPT_TAIL = """
+
+请遵循以下要求：
+1. 仅基于提供的知识库内容回答问题
+2. 如果知识库中没有相关信息，请明确说明
+3. 回答要准确、详细且有条理
+4. 使用中文回答
+5. 如果可能，请提供具体的例子或解释
+
+回答："""
+
 class ChatService:
     """对话服务类"""
     
-    def __init__(self, config_manager: ConfigManager):
+    # 实例属性固定，使用__slots__省去每个实例的__dict__
+    __slots__ = ('config_manager', 'config', 'client', 'model_name', 'max_tokens', 'temperature',
+                 'max_retries', 'retry_delay', 'semantic_cache', '_cache_index_version')
+    
+    def __init__(self, config_manager: ConfigManager, llm_client: Optional["OpenAI"] = None):
         """
         初始化对话服务
         
         Args:
             config_manager: 配置管理器实例
+            llm_client: OpenAI兼容的API客户端，默认为None表示按配置创建DeepSeek客户端；
+                        测试时可传入桩对象，避免真实的网络请求
         """
         self.config_manager = config_manager
         self.config = config_manager.get_config()
-        self.client = None
-        self._initialize_client()
+        self.client = llm_client
+        if self.client is None:
+            self._initialize_client()
         
         # 从配置中获取模型参数
         self.model_name = self.config.llm_model
@@ -39,6 +72,16 @@ class ChatService:
         self.max_retries = 3  # 默认重试次数
         self.retry_delay = 1  # 默认重试延迟
         
+        # 语义缓存：语义相近的问题直接复用已生成的回答，跳过检索和LLM调用（默认关闭）
+        self.semantic_cache: Optional[SemanticCache] = None
+        if self.config.cache_enabled and self.config.semantic_cache_size > 0:
+            self.semantic_cache = SemanticCache(
+                max_size=self.config.semantic_cache_size,
+                similarity_threshold=self.config.semantic_cache_threshold
+            )
+        # 语义缓存中的回答所基于的索引版本，索引重建或重新加载后缓存随之清空
+        self._cache_index_version: Optional[int] = None
+        
         logger.info(f"ChatService初始化完成，使用模型: {self.model_name}")
     
     def _initialize_client(self):
@@ -50,12 +93,26 @@ class ChatService:
             if not api_key:
                 raise ValueError("DeepSeek API密钥未配置")
             
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url
-            )
+            cache_key = (api_key, base_url)
+            client = _CLIENT_CACHE.get(cache_key)
+            if client is None:
+                # 延迟导入：openai会连带导入httpx、pydantic等，导入开销较大
+                import httpx
+                from openai import OpenAI, DefaultHttpxClient
+                
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=DefaultHttpxClient(
+                        transport=httpx.HTTPTransport(retries=_CONNECT_RETRIES)
+                    )
+                )
+                _CLIENT_CACHE[cache_key] = client
+                logger.info("DeepSeek API客户端初始化成功")
+            else:
+                logger.info("复用已有的DeepSeek API客户端")
             
-            logger.info("DeepSeek API客户端初始化成功")
+            self.client = client
             
         except Exception as e:
             logger.error(f"DeepSeek API客户端初始化失败: {e}")
@@ -63,7 +120,7 @@ class ChatService:
     
 
     
-    def generate_answer_stream(self, question: str, retriever: RAGRetriever) -> Generator[Dict[str, Any], None, None]:
+    def generate_answer_stream(self, question: str, retriever: "RAGRetriever") -> Generator[Dict[str, Any], None, None]:
         """
         生成问题的答案（流式）
         
@@ -77,6 +134,7 @@ class ChatService:
                 - content: 文本内容（仅在type='chunk'时）
                 - sources: 参考来源（仅在type='start'时）
                 - confidence: 置信度（仅在type='start'时）
+                - cached: 是否为语义缓存中的回答（仅在type='start'时）
                 - response_time: 响应时间（仅在type='end'时）
                 - error: 错误信息（仅在type='error'时）
         """
@@ -85,12 +143,29 @@ class ChatService:
         try:
             logger.info(f"开始流式处理问题: {question[:50]}...")
             
-            # 1. 使用RAG检索相关文档
+            # 1. 查询只向量化一次，语义缓存查找和检索共用该向量；缓存命中时直接返回已有回答
+            query_vector = None
+            embedding_model = getattr(retriever, 'embedding_model', None)
+            if self.semantic_cache is not None and embedding_model is not None and embedding_model.is_loaded():
+                self._sync_semantic_cache(retriever)
+                query_vector = embedding_model.encode_texts([question])[0]
+                cached = self.semantic_cache.lookup(query_vector)
+                if cached is not None:
+                    yield from self._replay_cached_answer(cached, start_time)
+                    return
+            
+            # 2. 使用RAG检索相关文档
             top_k = self.config.retrieval_top_k
             similarity_threshold = self.config.retrieval_similarity_threshold
             
-            logger.info(f"检索参数: top_k={top_k}, similarity_threshold={similarity_threshold}")
-            search_results = retriever.search(question, top_k=top_k, similarity_threshold=similarity_threshold)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"检索参数: top_k={top_k}, similarity_threshold={similarity_threshold}")
+            if query_vector is not None:
+                search_results = retriever.search_by_vector(
+                    query_vector, top_k=top_k, similarity_threshold=similarity_threshold
+                )
+            else:
+                search_results = retriever.search(question, top_k=top_k, similarity_threshold=similarity_threshold)
             
             if not search_results:
                 logger.warning("未找到相关文档")
@@ -101,37 +176,50 @@ class ChatService:
                 }
                 return
             
-            # 2. 提取上下文和来源
+            # 3. 一次遍历提取上下文、来源和置信度
             context_texts = []
-            sources = []
+            sources_map = {}  # 利用字典去重并保持来源的出现顺序
+            score_sum = 0.0
             
             for result in search_results:
                 context_texts.append(result.content)
-                source = result.metadata.get('source', '未知来源')
-                if source not in sources:
-                    sources.append(source)
+                sources_map.setdefault(result.metadata.get('source', '未知来源'), None)
+                score_sum += result.score
             
             context = "\n\n".join(context_texts)
-            confidence = sum(result.score for result in search_results) / len(search_results)
+            sources = list(sources_map)
+            confidence = score_sum / len(search_results)
             
-            # 3. 发送开始信号
+            # 4. 发送开始信号
             yield {
                 'type': 'start',
                 'sources': sources,
-                'confidence': confidence
+                'confidence': confidence,
+                'cached': False
             }
             
-            # 4. 构建提示词
+            # 5. 构建提示词
             prompt = self.build_prompt(question, context)
             
-            # 5. 流式调用API
+            # 6. 流式调用API（启用语义缓存时同时收集完整回答）
+            answer_parts = [] if query_vector is not None else None
             for chunk in self.call_api_stream(prompt):
+                if answer_parts is not None:
+                    answer_parts.append(chunk)
                 yield {
                     'type': 'chunk',
                     'content': chunk
                 }
             
-            # 6. 发送结束信号
+            # 7. 完整生成的回答写入语义缓存（中途失败时会抛出异常，不会缓存不完整的回答）
+            if answer_parts is not None:
+                self.semantic_cache.add(query_vector, {
+                    'sources': sources,
+                    'confidence': confidence,
+                    'answer': "".join(answer_parts)
+                })
+            
+            # 8. 发送结束信号
             response_time = time.time() - start_time
             logger.info(f"流式问题处理完成，耗时: {response_time:.2f}秒")
             
@@ -150,6 +238,45 @@ class ChatService:
                 'content': '抱歉，处理您的问题时遇到了技术问题，请稍后重试。'
             }
     
+    def _sync_semantic_cache(self, retriever: "RAGRetriever"):
+        """
+        检索器的索引内容变化（重建、追加或重新加载）后清空语义缓存
+        
+        缓存的回答基于生成时的检索结果，按向量存储的版本号判断是否过期
+        """
+        index_version = getattr(getattr(retriever, 'vector_store', None), 'version', None)
+        if index_version != self._cache_index_version:
+            if self._cache_index_version is not None:
+                logger.info("知识库索引已变化，清空语义缓存")
+            self.semantic_cache.clear()
+            self._cache_index_version = index_version
+    
+    def _replay_cached_answer(self, cached: Dict[str, Any], start_time: float) -> Generator[Dict[str, Any], None, None]:
+        """
+        以与正常流程相同的事件序列输出语义缓存中的回答
+        
+        Args:
+            cached: 语义缓存条目，包含sources、confidence和answer
+            start_time: 问题处理的开始时间
+        """
+        yield {
+            'type': 'start',
+            'sources': cached['sources'],
+            'confidence': cached['confidence'],
+            'cached': True
+        }
+        yield {
+            'type': 'chunk',
+            'content': cached['answer']
+        }
+        
+        response_time = time.time() - start_time
+        logger.info(f"语义缓存命中，耗时: {response_time:.3f}秒")
+        yield {
+            'type': 'end',
+            'response_time': response_time
+        }
+    
     def build_prompt(self, question: str, context: str) -> str:
         """
         构建RAG提示词
@@ -161,28 +288,15 @@ class ChatService:
         Returns:
             str: 构建好的提示词
         """
-        prompt_template = """你是一个专业的AI助手，请基于以下提供的知识库内容来回答用户的问题。
-
-知识库内容：
-{context}
-
-用户问题：{question}
-
-请遵循以下要求：
-1. 仅基于提供的知识库内容回答问题
-2. 如果知识库中没有相关信息，请明确说明
-3. 回答要准确、详细且有条理
-4. 使用中文回答
-5. 如果可能，请提供具体的例子或解释
-
-回答："""
-        
-        return prompt_template.format(context=context, question=question)
+        return _PROMPT_HEAD + context + _PROMPT_MID + question + _PROMPT_TAIL
     
 
     def call_api_stream(self, prompt: str) -> Generator[str, None, None]:
         """
-        流式调用DeepSeek API
+        流式调用DeepSeek API（带重试）
+        
+        整个请求共用一个重试预算：仅在尚未输出任何内容时重试，
+        一旦开始输出，中途失败会直接抛出异常，避免回答内容重复。
         
         Args:
             prompt: 构建好的提示词
@@ -191,33 +305,21 @@ class ChatService:
             str: API返回的文本块
         """
         for attempt in range(self.max_retries):
+            yielded = False
             try:
                 logger.debug(f"流式调用DeepSeek API，尝试次数: {attempt + 1}")
                 
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    stream=True  # 启用流式输出
-                )
-                
-                logger.debug("DeepSeek API流式调用成功")
-                
-                # 处理流式响应
-                for chunk in response:
-                    if chunk.choices[0].delta.content is not None:
-                        content = chunk.choices[0].delta.content
-                        yield content
+                for content in self._call_api_stream_once(prompt):
+                    yielded = True
+                    yield content
                 
                 return  # 成功完成，退出重试循环
                 
             except Exception as e:
+                # 已输出部分内容时重试会导致回答重复，直接报错
+                if yielded:
+                    raise Exception(f"流式输出中断: {str(e)}")
+                
                 logger.warning(f"流式API调用失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
                 
                 if attempt < self.max_retries - 1:
@@ -225,6 +327,36 @@ class ChatService:
                 else:
                     raise Exception(f"流式API调用失败，已重试{self.max_retries}次: {str(e)}")
     
+    def _call_api_stream_once(self, prompt: str) -> Generator[str, None, None]:
+        """
+        单次流式调用DeepSeek API，不做重试，失败时直接抛出异常
+        
+        Args:
+            prompt: 构建好的提示词
+            
+        Yields:
+            str: API返回的文本块
+        """
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            stream=True  # 启用流式输出
+        )
+        
+        logger.debug("DeepSeek API流式调用成功")
+        
+        # 处理流式响应
+        for chunk in response:
+            if chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
+    
     def health_check(self) -> Dict[str, Any]:
         """
         健康检查
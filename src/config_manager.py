@@ -13,14 +13,60 @@ import os
 import yaml
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 
+# 优先使用基于libyaml的C加速解析器（需PyYAML编译时链接libyaml），不可用时回退到纯Python实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 logger = logging.getLogger(__name__)
 
+# 进程内YAML解析结果缓存，键为(配置文件绝对路径, 修改时间ns)，文件未变化时跳过YAML解析；
+# 只缓存解析出的字典（只读），环境变量覆盖在每次加载时重新应用，每个管理器得到独立的Config
+_CONFIG_CACHE: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+# YAML嵌套配置项 (分节, 键) 到Config字段的映射
+_FLATTEN_MAP = {
+    ('embedding', 'model_name'): 'embedding_model_name',
+    ('embedding', 'device'): 'embedding_device',
+    ('embedding', 'max_length'): 'embedding_max_length',
+    ('embedding', 'batch_size'): 'embedding_batch_size',
+    ('embedding', 'quantize'): 'embedding_quantize',
+    ('embedding', 'num_threads'): 'embedding_num_threads',
+    ('embedding', 'bf16'): 'embedding_bf16',
+    ('retrieval', 'chunk_size'): 'retrieval_chunk_size',
+    ('retrieval', 'chunk_overlap'): 'retrieval_chunk_overlap',
+    ('retrieval', 'top_k'): 'retrieval_top_k',
+    ('retrieval', 'similarity_threshold'): 'retrieval_similarity_threshold',
+    ('llm', 'model'): 'llm_model',
+    ('llm', 'max_tokens'): 'llm_max_tokens',
+    ('llm', 'temperature'): 'llm_temperature',
+    ('llm', 'stream'): 'llm_stream',
+    ('llm', 'api_key'): 'llm_api_key',
+    ('llm', 'base_url'): 'llm_base_url',
+    ('paths', 'documents'): 'documents_path',
+    ('paths', 'vectors'): 'vectors_path',
+    ('paths', 'cache'): 'cache_path',
+    ('system', 'log_level'): 'log_level',
+    ('system', 'cache_enabled'): 'cache_enabled',
+    ('system', 'max_documents'): 'max_documents',
+    ('system', 'semantic_cache_size'): 'semantic_cache_size',
+    ('system', 'semantic_cache_threshold'): 'semantic_cache_threshold',
+}
+
+# 可由环境变量覆盖的字符串配置项
+_ENV_MAP = {
+    'DEEPSEEK_API_KEY': 'llm_api_key',
+    'DEEPSEEK_BASE_URL': 'llm_base_url',
+    'LOG_LEVEL': 'log_level',
+}
 
-@dataclass
+
+@dataclass(slots=True)
 class Config:
     """统一的配置数据类"""
     
@@ -29,6 +75,9 @@ class Config:
     embedding_device: str = "cpu"
     embedding_max_length: int = 512
     embedding_batch_size: int = 32
+    embedding_quantize: bool = False
+    embedding_num_threads: int = 0
+    embedding_bf16: bool = False
     
     # 检索配置
     retrieval_chunk_size: int = 500
@@ -53,6 +102,11 @@ class Config:
     log_level: str = "INFO"
     cache_enabled: bool = True
     max_documents: int = 100
+    semantic_cache_size: int = 0
+    semantic_cache_threshold: float = 0.95
+    
+    # 按分节组织的配置字典，供向后兼容的属性访问使用
+    _sections: Dict[str, Dict[str, Any]] = field(init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """配置后处理和验证"""
@@ -60,57 +114,37 @@ class Config:
         for path_attr in ['documents_path', 'vectors_path', 'cache_path']:
             path = getattr(self, path_attr)
             Path(path).mkdir(parents=True, exist_ok=True)
+        
+        # 预先构建分节配置字典
+        self._sections = {}
+        for (section, key), field_name in _FLATTEN_MAP.items():
+            self._sections.setdefault(section, {})[key] = getattr(self, field_name)
     
-    # 为了保持向后兼容性，提供属性访问方法
+    # 为了保持向后兼容性，提供属性访问方法（返回__post_init__中预先构建的字典）
     @property
     def embedding(self) -> Dict[str, Any]:
         """返回嵌入配置字典（向后兼容）"""
-        return {
-            'model_name': self.embedding_model_name,
-            'device': self.embedding_device,
-            'max_length': self.embedding_max_length,
-            'batch_size': self.embedding_batch_size
-        }
+        return self._sections['embedding']
     
     @property
     def retrieval(self) -> Dict[str, Any]:
         """返回检索配置字典（向后兼容）"""
-        return {
-            'chunk_size': self.retrieval_chunk_size,
-            'chunk_overlap': self.retrieval_chunk_overlap,
-            'top_k': self.retrieval_top_k,
-            'similarity_threshold': self.retrieval_similarity_threshold
-        }
+        return self._sections['retrieval']
     
     @property
     def llm(self) -> Dict[str, Any]:
         """返回LLM配置字典（向后兼容）"""
-        return {
-            'model': self.llm_model,
-            'max_tokens': self.llm_max_tokens,
-            'temperature': self.llm_temperature,
-            'stream': self.llm_stream,
-            'api_key': self.llm_api_key,
-            'base_url': self.llm_base_url
-        }
+        return self._sections['llm']
     
     @property
     def paths(self) -> Dict[str, str]:
         """返回路径配置字典（向后兼容）"""
-        return {
-            'documents': self.documents_path,
-            'vectors': self.vectors_path,
-            'cache': self.cache_path
-        }
+        return self._sections['paths']
     
     @property
     def system(self) -> Dict[str, Any]:
         """返回系统配置字典（向后兼容）"""
-        return {
-            'log_level': self.log_level,
-            'cache_enabled': self.cache_enabled,
-            'max_documents': self.max_documents
-        }
+        return self._sections['system']
 
 
 class ConfigManager:
@@ -125,7 +159,7 @@ class ConfigManager:
         """
         self.config_path = config_path
         self._config: Optional[Config] = None
-        
+    
     def load_config(self) -> Config:
         """
         加载配置文件
@@ -135,20 +169,27 @@ class ConfigManager:
         """
         if self._config is not None:
             return self._config
-            
+        
         try:
             # 加载环境变量
             self._load_env_variables()
             
-            # 加载YAML配置文件
-            config_data = self._load_yaml_config()
+            # 加载YAML配置文件（文件未变化时复用缓存的解析结果）
+            cache_key = self._cache_key()
+            config_data = _CONFIG_CACHE.get(cache_key)
+            if config_data is not None:
+                logger.debug(f"使用缓存的配置文件解析结果: {self.config_path}")
+            else:
+                config_data = self._load_yaml_config()
+                if cache_key is not None:
+                    _CONFIG_CACHE[cache_key] = config_data
             
-            # 创建配置对象
+            # 创建配置对象（环境变量覆盖在此应用）
             self._config = self._create_config_from_dict(config_data)
             
             logger.info(f"配置加载成功: {self.config_path}")
             return self._config
-            
+        
         except Exception as e:
             logger.error(f"配置加载失败: {e}")
             # 返回默认配置
@@ -156,6 +197,13 @@ class ConfigManager:
             logger.info("使用默认配置")
             return self._config
     
+    def _cache_key(self) -> Optional[Tuple[str, int]]:
+        """计算配置缓存键，配置文件不存在时返回None"""
+        try:
+            return (os.path.abspath(self.config_path), os.stat(self.config_path).st_mtime_ns)
+        except OSError:
+            return None
+    
     def _load_env_variables(self):
         """加载环境变量"""
         env_path = Path(".env")
@@ -170,72 +218,28 @@ class ConfigManager:
         if not os.path.exists(self.config_path):
             logger.warning(f"配置文件不存在: {self.config_path}")
             return {}
-            
+        
         with open(self.config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f) or {}
+            return yaml.load(f, Loader=_YamlLoader) or {}
     
     def _create_config_from_dict(self, config_data: Dict[str, Any]) -> Config:
         """从字典创建配置对象"""
-        # 扁平化嵌套配置
+        # 扁平化嵌套配置，未出现的配置项使用Config的默认值
         flat_config = {}
-        
-        # 处理嵌入配置
-        if 'embedding' in config_data:
-            embedding = config_data['embedding']
-            flat_config.update({
-                'embedding_model_name': embedding.get('model_name', 'BAAI/bge-small-zh-v1.5'),
-                'embedding_device': embedding.get('device', 'cpu'),
-                'embedding_max_length': embedding.get('max_length', 512),
-                'embedding_batch_size': embedding.get('batch_size', 32)
-            })
-        
-        # 处理检索配置
-        if 'retrieval' in config_data:
-            retrieval = config_data['retrieval']
-            flat_config.update({
-                'retrieval_chunk_size': retrieval.get('chunk_size', 500),
-                'retrieval_chunk_overlap': retrieval.get('chunk_overlap', 50),
-                'retrieval_top_k': retrieval.get('top_k', 5),
-                'retrieval_similarity_threshold': retrieval.get('similarity_threshold', 0.3)
-            })
-        
-        # 处理LLM配置
-        if 'llm' in config_data:
-            llm = config_data['llm']
-            flat_config.update({
-                'llm_model': llm.get('model', 'deepseek-chat'),
-                'llm_max_tokens': llm.get('max_tokens', 1000),
-                'llm_temperature': llm.get('temperature', 0.7),
-                'llm_stream': llm.get('stream', True),
-                'llm_api_key': llm.get('api_key', ''),
-                'llm_base_url': llm.get('base_url', 'https://api.deepseek.com')
-            })
+        for (section, key), field_name in _FLATTEN_MAP.items():
+            values = config_data.get(section) or {}
+            if key in values:
+                flat_config[field_name] = values[key]
         
         # 环境变量覆盖（优先级更高）
-        flat_config.update({
-            'llm_api_key': os.getenv('DEEPSEEK_API_KEY', flat_config.get('llm_api_key', '')),
-            'llm_base_url': os.getenv('DEEPSEEK_BASE_URL', flat_config.get('llm_base_url', 'https://api.deepseek.com')),
-            'log_level': os.getenv('LOG_LEVEL', flat_config.get('log_level', 'INFO')),
-            'cache_enabled': os.getenv('CACHE_ENABLED', str(flat_config.get('cache_enabled', True))).lower() in ('true', '1', 'yes', 'on')
-        })
-        
-        # 处理路径配置
-        if 'paths' in config_data:
-            paths = config_data['paths']
-            flat_config.update({
-                'documents_path': paths.get('documents', './data/documents'),
-                'vectors_path': paths.get('vectors', './data/vectors'),
-                'cache_path': paths.get('cache', './data/cache')
-            })
+        for env_name, field_name in _ENV_MAP.items():
+            value = os.getenv(env_name)
+            if value is not None:
+                flat_config[field_name] = value
         
-        # 处理系统配置
-        if 'system' in config_data:
-            system = config_data['system']
-            flat_config.update({
-                'log_level': system.get('log_level', 'INFO'),
-                'cache_enabled': system.get('cache_enabled', True),
-                'max_documents': system.get('max_documents', 100)
-            })
+        cache_enabled = os.getenv('CACHE_ENABLED')
+        if cache_enabled is not None:
+            flat_config['cache_enabled'] = cache_enabled.lower() in ('true', '1', 'yes', 'on')
         
         return Config(**flat_config)
     
@@ -248,6 +252,9 @@ class ConfigManager:
     def reload_config(self) -> Config:
         """重新加载配置"""
         self._config = None
+        config_path = os.path.abspath(self.config_path)
+        for key in [key for key in _CONFIG_CACHE if key[0] == config_path]:
+            del _CONFIG_CACHE[key]
         return self.load_config()
 
 
@@ -9,17 +9,61 @@ import os
 import re
 import logging
 import hashlib
+import mmap
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Mapping
+from dataclasses import dataclass, field
 from datetime import datetime
 
-@dataclass
+# 读取文档时依次尝试的编码（utf-8-sig兼容无BOM的utf-8，gb18030是gbk/gb2312的超集）
+_ENCODINGS = ('utf-8-sig', 'gbk', 'gb18030')
+
+# 超过该大小（字节）的文档通过mmap读取
+_MMAP_THRESHOLD = 1 << 20
+
+# Markdown处理用到的正则表达式，模块加载时编译一次
+_HEADER_RE = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
+_PARA_SPLIT_RE = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT_RE = re.compile(r'[。！？.!?]\s*')
+
+
+def _first_h1(content: str) -> Optional[str]:
+    """
+    用str.find定位第一个非空的一级标题，避免对全文做正则扫描
+    
+    Args:
+        content: 文档内容
+        
+    Returns:
+        标题文本，不存在时返回None
+    """
+    if content.startswith('# '):
+        start = 0
+    else:
+        start = content.find('\n# ') + 1
+        if start == 0:
+            return None
+    
+    while True:
+        end = content.find('\n', start)
+        title = content[start + 2:end if end != -1 else None].strip()
+        if title:
+            return title
+        if end == -1:
+            return None
+        start = content.find('\n# ', end) + 1
+        if start == 0:
+            return None
+
+@dataclass(slots=True, frozen=True)
 class DocumentChunk:
     """文档分块数据结构"""
     id: str
     content: str
-    metadata: Dict[str, Any]
+    # 由处理器生成时为ChainMap（分块字段 + 共享的文档元数据）；映射不可哈希，不参与计算哈希值
+    metadata: Mapping[str, Any] = field(hash=False)
     source_file: str
     chunk_index: int
     start_pos: int
@@ -40,11 +84,6 @@ class MarkdownDocumentProcessor:
         self.chunk_overlap = chunk_overlap
         self.logger = logging.getLogger(__name__)
         
-        # Markdown结构正则表达式
-        self.header_pattern = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
-        self.code_block_pattern = re.compile(r'```[\s\S]*?```', re.MULTILINE)
-        self.list_pattern = re.compile(r'^[\s]*[-*+]\s+', re.MULTILINE)
-        
     def load_document(self, file_path: str) -> str:
         """
         加载Markdown文档内容
@@ -71,21 +110,18 @@ class MarkdownDocumentProcessor:
             raise ValueError(f"不支持的文件格式: {file_path.suffix}，仅支持.md文件")
         
         try:
-            # 尝试多种编码读取文件
-            encodings = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312']
-            content = None
-            
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    self.logger.info(f"成功使用{encoding}编码读取文件: {file_path}")
-                    break
-                except UnicodeDecodeError:
-                    continue
+            # 大文件通过mmap直接从页缓存解码，省去一次完整的字节拷贝；
+            # 小文件一次性读入字节。两种情况都只打开文件一次
+            if file_path.stat().st_size >= _MMAP_THRESHOLD:
+                with open(file_path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+                    content = self._decode_bytes(raw, file_path)
+            else:
+                content = self._decode_bytes(file_path.read_bytes(), file_path)
             
-            if content is None:
-                raise UnicodeDecodeError("无法使用常见编码读取文件")
+            # 与文本模式读取保持一致，统一换行符
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
             
             return content
             
@@ -93,6 +129,32 @@ class MarkdownDocumentProcessor:
             self.logger.error(f"加载文档失败: {file_path}, 错误: {e}")
             raise
     
+    def _decode_bytes(self, raw, file_path: Path) -> str:
+        """
+        在内存中依次尝试多种编码解码
+        
+        Args:
+            raw: 文件字节内容（bytes或mmap）
+            file_path: 文件路径（用于日志）
+            
+        Returns:
+            解码后的文本
+            
+        Raises:
+            UnicodeDecodeError: 所有编码都无法解码
+        """
+        last_error = None
+        
+        for encoding in _ENCODINGS:
+            try:
+                content = str(raw, encoding)
+                self.logger.info(f"成功使用{encoding}编码读取文件: {file_path}")
+                return content
+            except UnicodeDecodeError as e:
+                last_error = e
+        
+        raise last_error
+    
     def process_document(self, file_path: str) -> List[DocumentChunk]:
         """
         处理Markdown文档，返回分块结果
@@ -123,6 +185,31 @@ class MarkdownDocumentProcessor:
             self.logger.error(f"处理文档失败: {file_path}, 错误: {e}")
             raise
     
+    def process_documents(self, file_paths: List[str], max_workers: Optional[int] = None) -> List[DocumentChunk]:
+        """
+        使用进程池并行处理多个Markdown文档
+        
+        分块是纯Python的CPU密集型工作，多进程可以绕开GIL。
+        结果按输入文件顺序合并，与逐个调用process_document一致。
+        
+        Args:
+            file_paths: 文档路径列表
+            max_workers: 最大进程数，默认使用CPU核数
+            
+        Returns:
+            所有文档的分块列表
+        """
+        file_paths = [str(path) for path in file_paths]
+        
+        # 单个文件或单进程时直接处理，省去进程池启动开销
+        if len(file_paths) <= 1 or max_workers == 1:
+            results = map(self.process_document, file_paths)
+            return [chunk for chunks in results for chunk in chunks]
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self.process_document, file_paths, chunksize=8)
+            return [chunk for chunks in results for chunk in chunks]
+    
     def _preprocess_markdown(self, content: str) -> str:
         """
         预处理Markdown内容
@@ -133,11 +220,19 @@ class MarkdownDocumentProcessor:
         Returns:
             预处理后的内容
         """
-        # 移除多余的空行（保留段落结构）
-        content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
-        
-        # 清理行尾空格
-        content = re.sub(r'[ \t]+$', '', content, flags=re.MULTILINE)
+        # 单次逐行扫描：清理行尾空格，空白行统一为空行，连续多个空白行压缩为一个。
+        # 这样预处理后的段落分隔符恰好是'\n\n'，_split_by_structure可以走快速路径
+        lines: List[str] = []
+        in_blank_run = False
+        for line in content.split('\n'):
+            if not line or line.isspace():
+                if not in_blank_run:
+                    lines.append('')
+                    in_blank_run = True
+                continue
+            in_blank_run = False
+            lines.append(line.rstrip(' \t'))
+        content = '\n'.join(lines)
         
         # 确保文档以换行符结尾
         if not content.endswith('\n'):
@@ -160,12 +255,12 @@ class MarkdownDocumentProcessor:
         stat = file_path.stat()
         
         # 提取标题（第一个一级标题）
-        title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-        title = title_match.group(1) if title_match else file_path.stem
+        title = _first_h1(content) or file_path.stem
         
         # 统计文档信息
-        headers = self.header_pattern.findall(content)
-        code_blocks = self.code_block_pattern.findall(content)
+        # 只计数不收集匹配结果；代码块按成对的```围栏计数
+        header_count = sum(1 for _ in _HEADER_RE.finditer(content))
+        code_block_count = content.count('```') // 2
         
         metadata = {
             'file_name': file_path.name,
@@ -175,9 +270,11 @@ class MarkdownDocumentProcessor:
             'modified_time': datetime.fromtimestamp(stat.st_mtime),
             'title': title,
             'content_length': len(content),
-            'header_count': len(headers),
-            'code_block_count': len(code_blocks),
-            'document_type': 'markdown'
+            'header_count': header_count,
+            'code_block_count': code_block_count,
+            'document_type': 'markdown',
+            # 分块创建时间：同一文档的分块一起生成，只取一次时间
+            'created_at': datetime.now()
         }
         
         return metadata
@@ -199,68 +296,64 @@ class MarkdownDocumentProcessor:
         # 按段落分割（保持Markdown结构）
         paragraphs = self._split_by_structure(text)
         
-        current_chunk = ""
+        # 用片段列表加长度计数累积当前chunk，避免反复拼接字符串
+        current_parts: List[str] = []
+        current_len = 0
         current_start = 0
         chunk_index = 0
         
+        # 循环内频繁使用的属性提前取到局部变量
+        chunk_size = self.chunk_size
+        chunk_overlap = self.chunk_overlap
+        
         for paragraph in paragraphs:
+            paragraph_len = len(paragraph)
+            
             # 如果当前段落本身就超过chunk_size，需要强制分割
-            if len(paragraph) > self.chunk_size:
+            if paragraph_len > chunk_size:
                 # 先保存当前chunk（如果有内容）
-                if current_chunk.strip():
-                    chunk = self._create_chunk(
-                        current_chunk.strip(), 
-                        metadata, 
-                        file_path, 
-                        chunk_index, 
-                        current_start, 
-                        current_start + len(current_chunk)
-                    )
+                current_chunk = ''.join(current_parts)
+                chunk = self._create_trimmed_chunk(current_chunk, metadata, file_path, chunk_index, current_start)
+                if chunk:
                     chunks.append(chunk)
                     chunk_index += 1
                 
-                # 对超长段落进行强制分割
-                long_chunks = self._force_split_paragraph(paragraph, metadata, file_path, chunk_index, current_start)
+                # 对超长段落进行强制分割，段落起点即当前chunk的结束位置
+                paragraph_start = current_start + current_len
+                long_chunks = self._force_split_paragraph(paragraph, metadata, file_path, chunk_index, paragraph_start)
                 chunks.extend(long_chunks)
                 chunk_index += len(long_chunks)
                 
-                current_chunk = ""
-                current_start += len(paragraph)
+                current_parts = []
+                current_len = 0
+                current_start = paragraph_start + paragraph_len
                 
             # 如果添加这个段落会超过chunk_size
-            elif len(current_chunk) + len(paragraph) > self.chunk_size:
+            elif current_len + paragraph_len > chunk_size:
                 # 保存当前chunk
-                if current_chunk.strip():
-                    chunk = self._create_chunk(
-                        current_chunk.strip(), 
-                        metadata, 
-                        file_path, 
-                        chunk_index, 
-                        current_start, 
-                        current_start + len(current_chunk)
-                    )
+                current_chunk = ''.join(current_parts)
+                chunk = self._create_trimmed_chunk(current_chunk, metadata, file_path, chunk_index, current_start)
+                if chunk:
                     chunks.append(chunk)
                     chunk_index += 1
                 
-                # 开始新的chunk，考虑重叠
-                overlap_text = self._get_overlap_text(current_chunk, self.chunk_overlap)
-                current_chunk = overlap_text + paragraph
-                current_start = current_start + len(current_chunk) - len(overlap_text) - len(paragraph)
+                # 开始新的chunk，考虑重叠：重叠文本是上一个chunk的尾部，
+                # 新chunk从上一个chunk结束位置往回overlap_len处开始，长度计数以重叠长度为起点
+                emitted_end = current_start + current_len
+                overlap_text = self._get_overlap_text(current_chunk, chunk_overlap)
+                overlap_len = len(overlap_text)
+                current_parts = [overlap_text, paragraph]
+                current_len = overlap_len + paragraph_len
+                current_start = emitted_end - overlap_len
                 
             else:
                 # 添加到当前chunk
-                current_chunk += paragraph
+                current_parts.append(paragraph)
+                current_len += paragraph_len
         
         # 处理最后一个chunk
-        if current_chunk.strip():
-            chunk = self._create_chunk(
-                current_chunk.strip(), 
-                metadata, 
-                file_path, 
-                chunk_index, 
-                current_start, 
-                current_start + len(current_chunk)
-            )
+        chunk = self._create_trimmed_chunk(''.join(current_parts), metadata, file_path, chunk_index, current_start)
+        if chunk:
             chunks.append(chunk)
         
         return chunks
@@ -275,17 +368,20 @@ class MarkdownDocumentProcessor:
         Returns:
             段落列表
         """
-        # 按双换行符分割段落，保持结构
-        paragraphs = re.split(r'\n\s*\n', text)
-        
-        # 确保每个段落都以换行符结尾（除了最后一个）
-        result = []
-        for i, paragraph in enumerate(paragraphs):
-            if paragraph.strip():
-                if i < len(paragraphs) - 1:
-                    result.append(paragraph + '\n\n')
-                else:
-                    result.append(paragraph)
+        # 按双换行符分割段落，保持结构。预处理后的文本中段落分隔符都是'\n\n'，
+        # 直接用str.split；含空白行或连续空行的文本回退到正则
+        if '\n\n\n' in text or '\n \n' in text or '\n\t\n' in text:
+            paragraphs = _PARA_SPLIT_RE.split(text)
+        else:
+            paragraphs = text.split('\n\n')
+        
+        # 丢弃空白段落，确保每个段落都以换行符结尾（除了最后一个）
+        last = len(paragraphs) - 1
+        result = [
+            paragraph + '\n\n' if i < last else paragraph
+            for i, paragraph in enumerate(paragraphs)
+            if paragraph and not paragraph.isspace()
+        ]
         
         return result
     
@@ -306,33 +402,32 @@ class MarkdownDocumentProcessor:
         """
         chunks = []
         chunk_index = start_chunk_index
-        pos = start_pos
-        
-        # 按句子分割（简单实现）
-        sentences = re.split(r'[。！？.!?]\s*', paragraph)
-        
-        current_chunk = ""
-        for sentence in sentences:
-            if not sentence.strip():
-                continue
-                
-            sentence = sentence + '。'  # 恢复句号
-            
-            if len(current_chunk) + len(sentence) > self.chunk_size and current_chunk:
-                # 保存当前chunk
-                chunk = self._create_chunk(current_chunk.strip(), metadata, file_path, chunk_index, pos, pos + len(current_chunk))
-                chunks.append(chunk)
-                chunk_index += 1
-                pos += len(current_chunk)
-                
-                # 开始新chunk
-                current_chunk = sentence
-            else:
-                current_chunk += sentence
+        chunk_size = self.chunk_size
+        
+        # 按句子分割：只记录每个句子的结束位置（含句末标点及其后的空白），
+        # 直接在原段落上切片，保留原有标点
+        paragraph_len = len(paragraph)
+        sentence_ends = [m.end() for m in _SENTENCE_SPLIT_RE.finditer(paragraph)]
+        if not sentence_ends or sentence_ends[-1] != paragraph_len:
+            sentence_ends.append(paragraph_len)
+        
+        chunk_begin = 0
+        prev_end = 0
+        for end in sentence_ends:
+            # 加入这个句子会超过chunk_size时，先保存当前chunk
+            if end - chunk_begin > chunk_size and prev_end > chunk_begin:
+                chunk = self._create_trimmed_chunk(paragraph[chunk_begin:prev_end], metadata, file_path,
+                                                   chunk_index, start_pos + chunk_begin)
+                if chunk:
+                    chunks.append(chunk)
+                    chunk_index += 1
+                chunk_begin = prev_end
+            prev_end = end
         
         # 处理最后一个chunk
-        if current_chunk.strip():
-            chunk = self._create_chunk(current_chunk.strip(), metadata, file_path, chunk_index, pos, pos + len(current_chunk))
+        chunk = self._create_trimmed_chunk(paragraph[chunk_begin:], metadata, file_path,
+                                           chunk_index, start_pos + chunk_begin)
+        if chunk:
             chunks.append(chunk)
         
         return chunks
@@ -348,17 +443,45 @@ class MarkdownDocumentProcessor:
         Returns:
             重叠文本
         """
+        # 不需要重叠时直接返回（text[-0:]会取到整段文本）
+        if overlap_size <= 0:
+            return ''
+        
         if len(text) <= overlap_size:
             return text
         
-        # 尝试在句子边界处截取
-        overlap_text = text[-overlap_size:]
-        sentence_start = overlap_text.find('。')
+        # 尝试在句子边界处截取，直接在原文本上查找，避免先切出尾部字符串
+        cutoff = len(text) - overlap_size
+        sentence_start = text.find('。', cutoff)
         
         if sentence_start != -1:
-            return overlap_text[sentence_start + 1:]
+            return text[sentence_start + 1:]
         
-        return overlap_text
+        return text[cutoff:]
+    
+    def _create_trimmed_chunk(self, text: str, metadata: Dict[str, Any], file_path: str,
+                              chunk_index: int, start_pos: int) -> Optional[DocumentChunk]:
+        """
+        去除首尾空白后创建分块，位置按去除空白后的内容计算
+        
+        Args:
+            text: 未去除空白的分块文本
+            metadata: 文档元数据
+            file_path: 文件路径
+            chunk_index: 分块索引
+            start_pos: text在文档中的开始位置
+            
+        Returns:
+            文档分块对象，text全为空白时返回None
+        """
+        content = text.strip()
+        if not content:
+            return None
+        
+        # 首个非空白字符就是content[0]，用find定位即可得到前导空白长度
+        content_start = start_pos + text.find(content[0])
+        return self._create_chunk(content, metadata, file_path, chunk_index,
+                                  content_start, content_start + len(content))
     
     def _create_chunk(self, content: str, metadata: Dict[str, Any], 
                      file_path: str, chunk_index: int, start_pos: int, end_pos: int) -> DocumentChunk:
@@ -376,18 +499,17 @@ class MarkdownDocumentProcessor:
         Returns:
             文档分块对象
         """
-        # 生成唯一ID
-        chunk_id = hashlib.md5(f"{file_path}_{chunk_index}_{content[:50]}".encode()).hexdigest()[:16]
+        # 生成唯一ID（blake2b直接输出8字节摘要，即16位十六进制）
+        chunk_id = hashlib.blake2b(f"{file_path}_{chunk_index}_{content[:50]}".encode(), digest_size=8).hexdigest()
         
-        # 分块元数据
-        chunk_metadata = {
-            **metadata,
+        # 分块元数据：分块自身字段在前，文档级元数据作为共享的后备映射，
+        # 同一文档的所有分块引用同一个字典，不再逐块复制
+        chunk_metadata = ChainMap({
             'chunk_length': len(content),
             'chunk_index': chunk_index,
             'start_pos': start_pos,
-            'end_pos': end_pos,
-            'created_at': datetime.now()
-        }
+            'end_pos': end_pos
+        }, metadata)
         
         return DocumentChunk(
             id=chunk_id,
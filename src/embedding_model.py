@@ -5,13 +5,92 @@
 专门负责文本向量化处理
 """
 
+import os
+import hashlib
 import logging
+import sqlite3
+import threading
 import numpy as np
-from typing import List
+import torch
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
+# 关闭HuggingFace tokenizers的内部并行，避免进程fork后的死锁警告和线程争抢
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+# 向量缓存的SQLite文件名（位于cache_dir下）
+EMBEDDING_CACHE_FILE = "embeddings.sqlite3"
+
+# 进程内已加载的模型，键为(模型名称, 设备, 是否量化, 是否bf16)。
+# 同一进程多次创建EmbeddingModel（如各项测试）时直接复用，不再重复读取权重和分词器
+_MODEL_CACHE: Dict[Tuple[str, str, bool, bool], SentenceTransformer] = {}
+
+# 单条SQL中IN查询的最大参数个数，低于SQLite默认的参数上限
+_SQLITE_BATCH = 500
+
+def _bf16_linear_input(module: torch.nn.Module, args: tuple) -> tuple:
+    """bf16线性层的前向预处理钩子：输入转换为bfloat16，以bf16执行矩阵乘法"""
+    return (args[0].to(torch.bfloat16),) + args[1:]
+
+def _bf16_linear_output(module: torch.nn.Module, args: tuple, output: torch.Tensor) -> torch.Tensor:
+    """bf16线性层的前向钩子：输出转换回float32，残差、LayerNorm和softmax仍以fp32计算"""
+    return output.float()
+
+# CPU上一次编码的文本数超过该值、且按当前PyTorch线程数还有空闲核时，分批并行执行前向计算
+PARALLEL_ENCODE_MIN_TEXTS = 512
+
+# 并行编码时每批的文本数
+PARALLEL_ENCODE_BATCH = 256
+
+
+class _EmbeddingCache:
+    """
+    基于SQLite的向量缓存
+    
+    键为(模型签名, 文本内容)的哈希，值为float32向量的字节串。重建索引时
+    未修改的分块直接命中缓存，无需再次执行模型前向计算。
+    """
+    
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 预热线程等也会调用编码，连接在线程间共享，由锁保证串行访问
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """批量查询缓存，返回命中的键到向量的映射"""
+        found = {}
+        try:
+            with self._lock:
+                for start in range(0, len(keys), _SQLITE_BATCH):
+                    batch = keys[start:start + _SQLITE_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    )
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+        except sqlite3.Error as e:
+            logger.warning(f"读取向量缓存失败: {e}")
+        return found
+    
+    def set_many(self, items: List[Tuple[bytes, bytes]]):
+        """批量写入缓存"""
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", items)
+        except sqlite3.Error as e:
+            logger.warning(f"写入向量缓存失败: {e}")
+
+
 class EmbeddingModel:
     """
     嵌入模型类
@@ -31,7 +110,9 @@ class EmbeddingModel:
         >>> vectors = model.encode_texts(["文本1", "文本2"])
     """
     
-    def __init__(self, model_name: str = "BAAI/bge-small-zh-v1.5", device: str = "cpu"):
+    def __init__(self, model_name: str = "BAAI/bge-small-zh-v1.5", device: str = "cpu", batch_size: int = 32,
+                 quantize: bool = False, num_threads: int = 0, cache_dir: Optional[str] = None,
+                 bf16: bool = False):
         """
         初始化嵌入模型
         
@@ -42,17 +123,42 @@ class EmbeddingModel:
                          - "cpu": 使用CPU计算（默认）
                          - "cuda": 使用GPU计算（需要CUDA支持）
                          - "mps": 使用Apple Silicon GPU（macOS）
+                         - "auto": 加载模型时自动选择，优先级 cuda > mps > cpu
+            batch_size (int): 编码时每个前向批次的文本数量，默认为32
+            quantize (bool): 是否在CPU上对模型的线性层做int8动态量化，默认为False
+                            可显著提升CPU编码速度，但向量会有轻微偏差，
+                            切换后需要重新构建索引
+            num_threads (int): CPU推理使用的线程数，默认为0表示沿用PyTorch的默认设置；
+                              多个进程同时编码时应显式设置，避免线程数超过物理核数
+            cache_dir (str, optional): 向量缓存目录，默认为None表示不缓存。
+                                      设置后按文本内容缓存向量，重复编码相同文本时直接读取
+            bf16 (bool): 是否在CPU上以bfloat16执行线性层，默认为False。线性层权重访存减半，
+                        支持AVX512_BF16/AMX的CPU上矩阵乘法更快；词向量、残差、LayerNorm和softmax保持fp32，
+                        向量与fp32推理只有极小偏差，但切换后仍需要重新构建索引。
+                        CPU不支持或启用了quantize时忽略
         
         Attributes:
             model_name (str): 模型名称
             device (str): 计算设备
+            batch_size (int): 默认编码批大小
+            quantize (bool): 是否启用int8动态量化
+            num_threads (int): CPU推理线程数，0表示使用默认值
+            cache_dir (str): 向量缓存目录，None表示不缓存
+            bf16 (bool): 是否以bfloat16推理（加载模型时按CPU支持情况确定）
             model (SentenceTransformer): 加载的模型实例，初始为None
             embedding_dim (int): 嵌入向量维度，模型加载后确定
         """
         self.model_name = model_name
         self.device = device
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.cache_dir = cache_dir
+        self.bf16 = bf16
         self.model = None
         self.embedding_dim = None
+        self._cache = None
+        self._cache_prefix = b""
         logger.info(f"嵌入模型初始化 - 模型: {model_name}, 设备: {device}")
     
     def load_model(self):
@@ -63,37 +169,122 @@ class EmbeddingModel:
         首次使用时会自动下载模型文件到本地缓存，后续使用会直接从缓存加载。
         
         加载过程：
-        1. 实例化SentenceTransformer模型
-        2. 执行测试编码以确定向量维度
-        3. 设置模型为评估模式
+        1. 解析计算设备（device为"auto"时自动检测），按num_threads固定CPU线程数
+        2. 实例化SentenceTransformer模型（进程内已加载过相同模型时直接复用，
+           优先从本地缓存加载），CUDA/MPS设备上转换为半精度（fp16）
+        3. 启用quantize时，在CPU上对线性层做int8动态量化；否则启用bf16且CPU支持时把线性层转换为bfloat16
+        4. 执行测试编码以确定向量维度
+        5. 设置了cache_dir时打开向量缓存
         
         Returns:
             bool: 加载成功返回True，失败返回False
-            
+        
         Raises:
             Exception: 模型下载失败、设备不支持或其他加载错误
-            
+        
         Note:
             - 首次加载可能需要较长时间下载模型文件
             - 确保网络连接正常以便下载模型
             - GPU设备需要安装对应的CUDA或MPS支持
         """
         try:
-            logger.info(f"正在加载嵌入模型: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name, device=self.device)
+            self.device = self._resolve_device(self.device)
+            
+            # 显式固定CPU线程数，避免多进程时各自按核数开线程导致争抢
+            if self.num_threads > 0:
+                torch.set_num_threads(self.num_threads)
+                try:
+                    torch.set_num_interop_threads(1)
+                except RuntimeError:
+                    # 并行任务已经开始后不能再修改inter-op线程数
+                    pass
+                logger.info(f"CPU推理线程数: {self.num_threads}")
+            
+            if self.bf16 and not self._cpu_bf16_available():
+                self.bf16 = False
+            
+            cache_key = (self.model_name, self.device, self.quantize, self.bf16)
+            self.model = _MODEL_CACHE.get(cache_key)
+            if self.model is not None:
+                logger.info(f"复用已加载的嵌入模型: {self.model_name}, 设备: {self.device}")
+            else:
+                logger.info(f"正在加载嵌入模型: {self.model_name}, 设备: {self.device}")
+                self.model = self._load_sentence_transformer()
+                
+                # GPU（CUDA/MPS）上使用fp16推理，启用Tensor Core并减半显存占用和带宽
+                if self.device.startswith(("cuda", "mps")):
+                    self.model.half()
+                
+                # CPU上对线性层做int8动态量化，减少权重访存并使用int8点积指令
+                if self.quantize and self.device == "cpu":
+                    torch.ao.quantization.quantize_dynamic(
+                        self.model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                    )
+                    logger.info("已启用int8动态量化")
+                
+                # CPU上以bfloat16执行线性层：权重访存减半，支持AVX512_BF16/AMX时使用bf16矩阵乘法指令。
+                # 整个模型转为bf16时残差和LayerNorm的舍入误差逐层累积，向量偏差明显变大，
+                # 因此其余部分保持fp32，只在线性层的输入输出处转换精度
+                if self.bf16:
+                    for module in self.model.modules():
+                        if isinstance(module, torch.nn.Linear):
+                            module.to(torch.bfloat16)
+                            module.register_forward_pre_hook(_bf16_linear_input)
+                            module.register_forward_hook(_bf16_linear_output)
+                    logger.info("已启用bfloat16线性层推理")
+                
+                _MODEL_CACHE[cache_key] = self.model
             
             # 获取嵌入维度
             test_embedding = self.model.encode(["测试文本"])
             self.embedding_dim = test_embedding.shape[1]
             
+            # 缓存键包含模型、设备、量化和精度设置，这些都会影响向量结果
+            # （bf16只转换线性层，与早期整个模型转为bf16的向量不同，使用新的精度标记）
+            if self.cache_dir:
+                self._cache = _EmbeddingCache(Path(self.cache_dir) / EMBEDDING_CACHE_FILE)
+                precision = "bf16-linear" if self.bf16 else False
+                self._cache_prefix = f"{self.model_name}|{self.device}|{self.quantize}|{precision}\0".encode()
+                logger.info(f"已启用向量缓存: {self.cache_dir}")
+            
             logger.info(f"模型加载成功，嵌入维度: {self.embedding_dim}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"模型加载失败: {str(e)}")
             return False
     
-    def encode_texts(self, texts: List[str]) -> np.ndarray:
+    def _cpu_bf16_available(self) -> bool:
+        """判断当前设备是否适合bfloat16推理：仅限CPU、未启用int8量化，且CPU支持bf16指令"""
+        if self.device != "cpu":
+            logger.warning("bf16推理仅用于CPU，GPU上使用fp16")
+            return False
+        if self.quantize:
+            logger.warning("已启用int8动态量化，忽略bf16设置")
+            return False
+        try:
+            supported = torch.ops.mkldnn._is_mkldnn_bf16_supported()
+        except (AttributeError, RuntimeError):
+            supported = False
+        if not supported:
+            logger.warning("当前CPU不支持bf16指令，继续使用fp32推理")
+        return supported
+    
+    def _load_sentence_transformer(self) -> SentenceTransformer:
+        """
+        实例化SentenceTransformer模型
+        
+        优先只从本地缓存加载，省去每次启动时向HuggingFace查询文件更新的网络请求；
+        本地没有缓存（首次使用）时再联网下载。
+        """
+        try:
+            return SentenceTransformer(self.model_name, device=self.device, local_files_only=True)
+        except Exception as e:
+            logger.debug(f"本地缓存中没有模型，联网下载: {e}")
+            return SentenceTransformer(self.model_name, device=self.device)
+    
+    def encode_texts(self, texts: List[str], batch_size: Optional[int] = None,
+                     normalize: bool = True) -> np.ndarray:
         """
         编码文本为向量
         
@@ -102,13 +293,17 @@ class EmbeddingModel:
         
         处理流程：
         1. 验证模型是否已加载
-        2. 批量编码所有输入文本
-        3. 对向量进行L2标准化
-        4. 返回标准化后的向量数组
+        2. 启用缓存时先查询缓存，只对未命中的文本编码
+        3. 批量编码文本并进行L2标准化
+        4. 将新向量写入缓存，按输入顺序返回向量数组
         
         Args:
             texts (List[str]): 待编码的文本列表，每个元素为一个字符串
                               支持中英文混合文本，自动处理特殊字符
+            batch_size (int, optional): 每个前向批次的文本数量，默认使用初始化时的batch_size
+            normalize (bool): 是否对向量做L2标准化，默认为True。调用方自行标准化
+                             （例如与其他向量合并后统一处理）时可传False，避免重复计算；
+                             缓存只保存标准化后的向量，因此False时不经过缓存
         
         Returns:
             np.ndarray: 标准化的向量数组，形状为 (len(texts), embedding_dim)
@@ -117,10 +312,11 @@ class EmbeddingModel:
         Raises:
             ValueError: 模型未加载时抛出
             Exception: 编码过程中的其他错误（如内存不足、文本格式错误等）
-            
+        
         Note:
             - 向量已进行L2标准化，可直接用于余弦相似度计算
-            - 批量处理比单个文本编码更高效
+            - 批量处理比单个文本编码更高效，应尽量一次传入全部文本
+            - SentenceTransformer内部会按文本长度排序后分批，减少填充浪费，输出仍保持输入顺序
             - 空字符串会被编码为零向量
         
         Example:
@@ -132,12 +328,109 @@ class EmbeddingModel:
             raise ValueError("模型未加载，请先调用 load_model()")
         
         try:
-            embeddings = self.model.encode(texts, normalize_embeddings=True)
+            if self._cache is None or not normalize:
+                return self._encode(texts, batch_size, normalize)
+            
+            keys = [
+                hashlib.blake2b(self._cache_prefix + text.encode(), digest_size=16).digest()
+                for text in texts
+            ]
+            cached = self._cache.get_many(keys)
+            
+            embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+            missing = []
+            for i, key in enumerate(keys):
+                vector = cached.get(key)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    embeddings[i] = vector
+            
+            if missing:
+                new_embeddings = self._encode([texts[i] for i in missing], batch_size)
+                embeddings[missing] = new_embeddings
+                self._cache.set_many([
+                    (keys[i], embeddings[i].tobytes()) for i in missing
+                ])
+            
+            logger.debug(f"向量缓存命中 {len(texts) - len(missing)}/{len(texts)}")
             return embeddings
         except Exception as e:
             logger.error(f"文本编码失败: {str(e)}")
             raise
     
+    def _encode(self, texts: List[str], batch_size: Optional[int] = None,
+                normalize: bool = True) -> np.ndarray:
+        """使用模型编码文本（不经过缓存），始终返回float32向量"""
+        workers = (os.cpu_count() or 1) // torch.get_num_threads()
+        if self.device == "cpu" and len(texts) > PARALLEL_ENCODE_MIN_TEXTS and workers >= 2:
+            return self._encode_parallel(texts, normalize, workers)
+        
+        # 推理模式下跳过autograd记录
+        with torch.inference_mode():
+            # 以张量形式返回：各批次一次性torch.stack成连续矩阵，再零拷贝转换为numpy，
+            # 避免convert_to_numpy逐行转换后再由np.asarray整体复制一遍
+            embeddings = self.model.encode(
+                texts,
+                batch_size=batch_size or self.batch_size,
+                normalize_embeddings=normalize,
+                convert_to_tensor=True,
+                show_progress_bar=False
+            )
+        # fp16模型输出半精度向量，FAISS和缓存都要求float32（float32时float()不复制）
+        return embeddings.cpu().float().numpy()
+    
+    def _encode_parallel(self, texts: List[str], normalize: bool, workers: int) -> np.ndarray:
+        """
+        CPU上分批并行编码文本
+        
+        HF快速分词器不支持并发调用，所有批次先在当前线程依次分词，只把前向计算交给线程池：
+        PyTorch前向计算期间会释放GIL，多个批次可以同时运行。不修改进程级的PyTorch线程数，
+        并行批次数由调用方按核数和当前线程数（启动时由num_threads设置）计算，线程总数不超过核数
+        """
+        # 按长度排序后分批，同一批次内文本长度相近，减少填充
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        # sentence-transformers新版本用preprocess取代了tokenize
+        preprocess = getattr(self.model, 'preprocess', None) or self.model.tokenize
+        batches = [
+            preprocess([texts[i] for i in order[start:start + PARALLEL_ENCODE_BATCH]])
+            for start in range(0, len(order), PARALLEL_ENCODE_BATCH)
+        ]
+        
+        def forward(features) -> torch.Tensor:
+            # 推理模式按线程生效，需要在工作线程内开启
+            with torch.inference_mode():
+                embeddings = self.model(features)['sentence_embedding']
+                if normalize:
+                    embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+                return embeddings.float()
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(forward, batches))
+        
+        embeddings = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        embeddings[order] = torch.cat(parts).numpy()
+        return embeddings
+    
+    @staticmethod
+    def _resolve_device(device: str) -> str:
+        """
+        解析计算设备
+        
+        Args:
+            device (str): 配置的设备名称，"auto"表示自动检测
+        
+        Returns:
+            str: 实际使用的设备名称
+        """
+        if device != "auto":
+            return device
+        if torch.cuda.is_available():
+            return "cuda"
+        if torch.backends.mps.is_available():
+            return "mps"
+        return "cpu"
+    
     def get_embedding_dim(self) -> int:
         """
         获取嵌入向量维度
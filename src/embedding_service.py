@@ -17,7 +17,7 @@ from tqdm import tqdm
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class QueryResult:
     """查询结果数据结构"""
     chunk_id: str
@@ -189,7 +189,7 @@ class VectorStore:
         Attributes:
             embedding_service (EmbeddingService): 嵌入服务实例
             index (faiss.IndexFlatIP): FAISS索引实例，初始为None
-            chunk_metadata (Dict): 存储分块元数据的字典，键为chunk_id
+            chunk_metadata (Dict): 存储分块元数据的字典，键为向量在索引中的行号
             chunk_count (int): 已存储的分块数量
         """
         self.embedding_service = embedding_service
@@ -251,8 +251,7 @@ class VectorStore:
             # 存储元数据
             self.chunk_metadata = {}
             for i, chunk in enumerate(chunks):
-                chunk_id = f"chunk_{i}"
-                self.chunk_metadata[chunk_id] = {
+                self.chunk_metadata[i] = {
                     'content': chunk.content,
                     'metadata': chunk.metadata,
                     'index': i
@@ -344,11 +343,10 @@ class VectorStore:
                     logger.debug(f"过滤低相似度结果: score={score:.3f} < threshold={similarity_threshold}")
                     continue
                 
-                chunk_id = f"chunk_{idx}"
-                if chunk_id in self.chunk_metadata:
-                    metadata = self.chunk_metadata[chunk_id]
+                metadata = self.chunk_metadata.get(int(idx))
+                if metadata is not None:
                     result = QueryResult(
-                        chunk_id=chunk_id,
+                        chunk_id=f"chunk_{idx}",
                         content=metadata['content'],
                         score=float(score),
                         metadata=metadata['metadata']
@@ -420,7 +418,11 @@ class VectorStore:
             # 加载元数据
             with open(f"{index_path}.metadata", 'rb') as f:
                 data = pickle.load(f)
-                self.chunk_metadata = data['chunk_metadata']
+                # 兼容旧格式：键为"chunk_{i}"字符串时转换为整数行号
+                self.chunk_metadata = {
+                    int(key[6:]) if isinstance(key, str) else key: value
+                    for key, value in data['chunk_metadata'].items()
+                }
                 self.chunk_count = data['chunk_count']
             
             logger.info(f"索引加载成功: {index_path}, 向量数量: {self.index.ntotal}")
@@ -6,6 +6,7 @@ RAG检索器模块
 """
 
 import logging
+import numpy as np
 from typing import List, Dict, Any
 
 from .embedding_model import EmbeddingModel
@@ -105,13 +106,73 @@ class RAGRetriever:
         """
         return self.vector_store.search(query, top_k, similarity_threshold)
     
+    def search_raw(self, query: str, top_k: int = 50) -> List[QueryResult]:
+        """
+        执行不做阈值过滤的检索
+        
+        需要用多个阈值筛选同一查询的结果时，只检索一次，再按result.score自行过滤
+        
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+            
+        Returns:
+            按相似度降序排列的查询结果列表
+        """
+        return self.vector_store.search(query, top_k, float('-inf'))
+    
+    def search_by_vector(self, query_vector: np.ndarray, top_k: int = 5,
+                         similarity_threshold: float = 0.3) -> List[QueryResult]:
+        """
+        用已经向量化的查询执行检索，跳过查询向量化
+        
+        Args:
+            query_vector: 标准化的查询向量，可由embedding_model.encode_texts得到
+            top_k: 返回结果数量
+            similarity_threshold: 相似度阈值，低于此值的结果将被过滤
+            
+        Returns:
+            查询结果列表
+        """
+        return self.vector_store.search_by_vector(query_vector, top_k, similarity_threshold)
+    
+    def search_batch(self, queries: List[str], top_k: int = 5,
+                     similarity_threshold: float = 0.3) -> List[List[QueryResult]]:
+        """
+        批量执行检索，查询一次性向量化并在FAISS中批量搜索
+        
+        Args:
+            queries: 查询文本列表
+            top_k: 每个查询返回结果数量
+            similarity_threshold: 相似度阈值，低于此值的结果将被过滤
+            
+        Returns:
+            与queries一一对应的查询结果列表
+        """
+        return self.vector_store.search_batch(queries, top_k, similarity_threshold)
+    
+    def search_batch_by_vectors(self, query_vectors: np.ndarray, top_k: int = 5,
+                                similarity_threshold: float = 0.3) -> List[List[QueryResult]]:
+        """
+        用已经向量化的一批查询执行检索，一次FAISS搜索得到全部结果
+        
+        Args:
+            query_vectors: 标准化的查询向量矩阵，形状为 (n_queries, embedding_dim)
+            top_k: 每个查询返回结果数量
+            similarity_threshold: 相似度阈值，低于此值的结果将被过滤
+            
+        Returns:
+            与query_vectors各行一一对应的查询结果列表
+        """
+        return self.vector_store.search_batch_by_vectors(query_vectors, top_k, similarity_threshold)
+    
     def save_index(self, index_path: str):
         """保存索引"""
         self.vector_store.save_index(index_path)
     
-    def load_index(self, index_path: str):
-        """加载索引"""
-        self.vector_store.load_index(index_path)
+    def load_index(self, index_path: str, mmap: bool = True):
+        """加载索引，默认以只读内存映射方式打开FAISS索引"""
+        self.vector_store.load_index(index_path, mmap=mmap)
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
@@ -125,4 +186,4 @@ class RAGRetriever:
             bool: 如果嵌入模型已加载且向量存储有索引则返回True
         """
         return (self.embedding_model.is_loaded() and 
-                self.vector_store.index is not None)
\ No newline at end of file
+                self.vector_store.is_built())
\ No newline at end of file
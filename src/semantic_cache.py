@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语义缓存模块
+按查询向量缓存问答结果，语义相近的问题直接复用已生成的回答
+"""
+
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# 默认的缓存命中阈值：查询向量与已缓存问题的余弦相似度不低于该值时视为同一问题
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+# 默认的最大缓存条目数
+DEFAULT_MAX_SIZE = 128
+
+
+class SemanticCache:
+    """
+    以查询向量为键的LRU问答缓存
+    
+    已缓存问题的向量存放在FAISS内积索引中，查找时检索最相似的一条，
+    相似度达到阈值即返回对应的缓存内容。超过容量时淘汰最久未命中的条目。
+    """
+    
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        """
+        初始化语义缓存
+        
+        Args:
+            max_size: 最大缓存条目数
+            similarity_threshold: 命中阈值（余弦相似度）
+        
+        Attributes:
+            _index (faiss.IndexIDMap2): 已缓存问题的向量索引，首次写入时按向量维度创建
+            _entries (OrderedDict): 条目ID到缓存内容的映射，按最近使用顺序排列
+            _next_id (int): 下一个条目ID
+        """
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        # 对话服务可能在多个线程中使用，索引和LRU顺序的读写需要加锁
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def lookup(self, query_vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        查找与查询向量语义相近的缓存条目
+        
+        Args:
+            query_vector: 查询向量，形状为 (embedding_dim,)
+        
+        Returns:
+            命中时返回缓存内容，否则返回None
+        """
+        query = self._prepare(query_vector)
+        with self._lock:
+            if self._index is None or not self._entries or query.shape[1] != self._index.d:
+                return None
+            scores, ids = self._index.search(query, 1)
+            entry_id = int(ids[0, 0])
+            if entry_id == -1 or scores[0, 0] < self.similarity_threshold:
+                return None
+            self._entries.move_to_end(entry_id)
+            logger.debug(f"语义缓存命中，相似度: {scores[0, 0]:.3f}")
+            return self._entries[entry_id]
+    
+    def add(self, query_vector: np.ndarray, payload: Dict[str, Any]):
+        """
+        写入缓存条目，超过容量时淘汰最久未使用的条目
+        
+        Args:
+            query_vector: 查询向量，形状为 (embedding_dim,)
+            payload: 缓存内容
+        """
+        query = self._prepare(query_vector)
+        with self._lock:
+            if self._index is None or query.shape[1] != self._index.d:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(query.shape[1]))
+                self._entries.clear()
+            
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(query, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = payload
+            
+            while len(self._entries) > self.max_size:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([evicted_id], dtype=np.int64))
+    
+    def clear(self):
+        """清空缓存（知识库索引重建后应调用，避免返回过期的回答）"""
+        with self._lock:
+            self._index = None
+            self._entries.clear()
+    
+    @staticmethod
+    def _prepare(query_vector: np.ndarray) -> np.ndarray:
+        """转换为单行float32矩阵并做L2归一化，使内积等于余弦相似度"""
+        query = np.array(np.reshape(query_vector, (1, -1)), dtype=np.float32)
+        faiss.normalize_L2(query)
+        return query
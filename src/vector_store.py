@@ -8,8 +8,12 @@
 import os
 import pickle
 import logging
+import tempfile
+import weakref
 import numpy as np
-from typing import List, Dict, Any
+from collections import OrderedDict
+from itertools import count, islice
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
 from dataclasses import dataclass
 import faiss
 from tqdm import tqdm
@@ -18,7 +22,89 @@ from .embedding_model import EmbeddingModel
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# index_type为"auto"时，分块数超过该值就把构建好的索引转换为IVF-PQ索引
+IVFPQ_THRESHOLD = 100_000
+
+# index_type为"auto"时，分块数超过该值（且不超过IVFPQ_THRESHOLD）就把构建好的索引转换为HNSW索引；
+# 低于该值时fp16暴力搜索只需扫描几MB数据，延迟已经很低，且召回率为1
+HNSW_THRESHOLD = 10_000
+
+# index_type为"ivf"时，向量数达到该值才转换为IVF-Flat索引，否则保留暴力搜索
+IVF_MIN_VECTORS = 1000
+
+# 训练IVF-PQ所需的最少向量数（PQ每个子空间有256个聚类中心）
+IVFPQ_MIN_VECTORS = 256
+
+# FAISS k-means训练时每个聚类中心至少需要的训练向量数，低于该值聚类质量差且FAISS会发出警告
+KMEANS_MIN_POINTS_PER_CENTROID = 39
+
+# IVF索引检索时默认探查的聚类数
+DEFAULT_NPROBE = 8
+
+# 查询数少于该值时FAISS检索只用单线程，线程调度开销比计算本身还大
+OMP_SINGLE_THREAD_MAX_QUERIES = 16
+
+# FAISS默认的OpenMP线程数（通常为核数），批量检索和构建索引时使用
+_OMP_MAX_THREADS = faiss.omp_get_max_threads()
+
+# CPU上的暴力搜索索引向量数不超过该值时，检索直接用numpy矩阵乘法完成，
+# 一次BLAS矩阵乘法比FAISS逐查询的调度开销更小
+NUMPY_SEARCH_MAX_VECTORS = 4096
+
+# build_index的分块数少于该值时，CPU暴力搜索索引类型先不创建FAISS索引，
+# 只保留numpy矩阵检索；保存索引或统计信息时再按需创建
+FAISS_MIN_BUILD_VECTORS = 256
+
+# 以只读内存映射方式加载的FAISS索引，键为(索引文件绝对路径, inode, 修改时间ns, 大小)。
+# 映射的索引只读，可以在多个VectorStore之间共享，重复加载同一文件时直接复用；
+# 文件被重写（save_index替换为新文件）后键随之变化，不会复用旧的映射。
+# 只弱引用索引：没有VectorStore再使用时索引随之释放，映射也随之解除
+_MAPPED_INDEX_CACHE: "weakref.WeakValueDictionary[Tuple[str, int, int, int], faiss.Index]" = \
+    weakref.WeakValueDictionary()
+
+# HNSW图中每个节点的邻居数
+HNSW_M = 32
+
+# HNSW构建时的候选队列长度
+HNSW_EF_CONSTRUCTION = 200
+
+# HNSW检索时默认的候选队列长度
+DEFAULT_EF_SEARCH = 64
+
+# 查询向量LRU缓存的最大条目数
+QUERY_CACHE_SIZE = 1024
+
+# 索引内容版本号的全局计数器，不同VectorStore实例的版本号也互不相同
+_INDEX_VERSIONS = count(1)
+
+
+def _file_identity(path: str) -> Tuple[str, int, int, int]:
+    """文件的标识：(路径, inode, 修改时间ns, 大小)，文件被替换或重写后随之变化"""
+    stat = os.stat(path)
+    return path, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def _write_atomically(path: str, write: Callable[[str], None]):
+    """
+    先由write写入同目录下的临时文件，再用os.replace替换目标文件
+    
+    已内存映射旧文件的索引继续引用旧inode，不会因为文件被原地截断重写而访问越界（SIGBUS）；
+    写入失败时删除临时文件，目标文件保持不变
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _as_f32(array: np.ndarray) -> np.ndarray:
+    """转换为FAISS需要的C连续float32数组，已满足要求时直接返回原数组，不做拷贝"""
+    return np.ascontiguousarray(array, dtype=np.float32)
+
+@dataclass(slots=True)
 class QueryResult:
     """查询结果数据结构"""
     chunk_id: str
@@ -33,7 +119,7 @@ class VectorStore:
     向量存储类
     
     基于FAISS库实现的高效向量存储和检索系统。支持大规模向量的快速相似度搜索，
-    使用IndexFlatIP索引实现精确的内积搜索，适用于RAG系统中的文档检索。
+    默认以fp16标量量化存储向量做暴力内积搜索，适用于RAG系统中的文档检索。
     
     主要功能：
     - 构建和管理FAISS向量索引
@@ -42,7 +128,8 @@ class VectorStore:
     - 向量数据库统计信息查询
     
     技术特点：
-    - 使用FAISS IndexFlatIP实现精确搜索
+    - 默认使用FAISS IndexScalarQuantizer(fp16)存储向量，内存和带宽为fp32的一半
+    - 大规模语料自动切换为IVF-PQ索引，降低检索计算量和内存占用
     - 支持批量向量添加和搜索
     - 内存高效的向量存储
     - 可扩展的索引结构
@@ -53,24 +140,70 @@ class VectorStore:
         >>> results = store.search(query, top_k=5)
     """
     
-    def __init__(self, embedding_model: EmbeddingModel):
+    def __init__(self, embedding_model: EmbeddingModel, index_type: str = "auto",
+                 nprobe: int = DEFAULT_NPROBE, device: str = "cpu",
+                 ef_search: int = DEFAULT_EF_SEARCH, pq_nlist: Optional[int] = None,
+                 pq_m: Optional[int] = None):
         """
         初始化向量存储
         
         Args:
             embedding_model (EmbeddingModel): 嵌入模型实例，用于文本向量化
                                              必须已完成模型加载
+            index_type (str, optional): 索引类型，可选值：
+                                       - "auto": 分块数超过IVFPQ_THRESHOLD时使用IVF-PQ，超过HNSW_THRESHOLD时
+                                                 使用fp16存储的HNSW，否则使用SQfp16暴力搜索（默认）
+                                       - "flat": 始终使用IndexFlatIP保存fp32向量精确搜索
+                                       - "sqfp16": 始终使用fp16标量量化索引暴力搜索
+                                       - "ivf": 向量数达到IVF_MIN_VECTORS时使用IVF-Flat近似搜索，否则使用IndexFlatIP
+                                       - "ivfpq": 始终使用IVF-PQ近似搜索（向量数不足以训练时保留SQfp16）
+                                       - "hnsw": 使用HNSW图索引，单条查询的检索时间随数据量对数增长
+            nprobe (int, optional): IVF索引检索时探查的聚类数，默认为8
+                                   越大召回率越高，检索越慢
+            device (str, optional): 索引所在设备，默认为"cpu"；设为"cuda"或"cuda:N"时，
+                                   构建或加载完成后把索引复制到GPU上检索（需要安装faiss-gpu）
+            ef_search (int, optional): HNSW索引检索时的候选队列长度，默认为64
+                                      越大召回率越高，检索越慢
+            pq_nlist (int, optional): IVF-PQ索引的聚类数，默认为None表示按4·sqrt(N)自动选择
+                                     （不超过N/39，保证每个聚类中心有足够的训练向量）
+            pq_m (int, optional): IVF-PQ索引的PQ子空间数（每个向量压缩为pq_m个字节），必须整除向量维度；
+                                 默认为None表示取不超过d/4且能整除d的最大值。
+                                 越小压缩率越高，召回率越低
         
         Attributes:
             embedding_model (EmbeddingModel): 嵌入模型实例
-            index (faiss.IndexFlatIP): FAISS索引实例，初始为None
-            chunk_metadata (Dict): 存储分块元数据的字典，键为chunk_id
+            index_type (str): 索引类型
+            nprobe (int): IVF索引的探查聚类数
+            device (str): 索引所在设备
+            ef_search (int): HNSW索引的检索候选队列长度
+            pq_nlist / pq_m (int): IVF-PQ索引的聚类数和PQ子空间数，None表示自动选择
+            index (faiss.Index): FAISS索引实例，初始为None
             chunk_count (int): 已存储的分块数量
+            _ids / _contents / _metas / _sources (List): 按FAISS行号对齐的分块ID、内容、
+                                                        元数据和来源（列式存储）
+            _query_cache (OrderedDict): 查询文本到查询向量的LRU缓存
+            _matrix_t (np.ndarray): 小规模暴力搜索索引的向量矩阵副本（按维度存储，形状为(d, N)），
+                                    用于numpy检索，不适用时为None
+            _index_mapped (bool): 索引数据是否为只读内存映射（映射的索引不能直接添加向量）
+            version (int): 索引内容的版本号，构建、追加或加载索引后更新；
+                           依赖索引内容的缓存（如语义缓存）据此判断是否过期
         """
+        if index_type not in ("auto", "flat", "sqfp16", "ivf", "ivfpq", "hnsw"):
+            raise ValueError(f"不支持的索引类型: {index_type}")
+        
         self.embedding_model = embedding_model
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.device = device
+        self.ef_search = ef_search
+        self.pq_nlist = pq_nlist
+        self.pq_m = pq_m
+        self._gpu_resources = None
         self.index = None
-        self.chunk_metadata = {}
-        self.chunk_count = 0
+        self._matrix_t: Optional[np.ndarray] = None
+        self._index_mapped = False
+        self._reset_chunks()
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
         logger.info("向量存储初始化完成")
     
     def build_index(self, chunks: List[Any]):
@@ -78,7 +211,7 @@ class VectorStore:
         构建向量索引
         
         从文档分块列表构建FAISS向量索引。处理流程包括文本向量化、索引创建和元数据存储。
-        使用IndexFlatIP索引类型，支持精确的内积相似度搜索。
+        按index_type创建索引（默认fp16标量量化），支持内积相似度搜索。
         
         处理步骤：
         1. 提取所有分块的文本内容
@@ -118,34 +251,466 @@ class VectorStore:
             
             # 向量化
             logger.info("正在进行文本向量化...")
-            embeddings = self.embedding_model.encode_texts(texts)
+            embeddings = self._encode_documents(texts)
             
-            # 创建FAISS索引
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)
+        except Exception as e:
+            logger.error(f"索引构建失败: {str(e)}")
+            raise
+        
+        # 嵌入模型输出的向量已经L2归一化，无需再处理
+        self.build_index_from_embeddings(chunks, embeddings, normalized=True)
+    
+    def build_index_from_embeddings(self, chunks: List[Any], embeddings: np.ndarray, normalized: bool = False):
+        """
+        用已经计算好的向量构建索引
+        
+        与build_index相同，但跳过向量化步骤，适合同一批分块的向量已经在别处算好、
+        需要多次构建索引的场景（如测试中复用同一份向量）。
+        
+        Args:
+            chunks (List[Any]): 文档分块列表，分块属性要求同build_index
+            embeddings (np.ndarray): 与chunks一一对应的向量，形状为 (len(chunks), embedding_dim)
+            normalized (bool): 向量是否已经L2归一化，默认为False。为False时入库前先做
+                               L2归一化（拷贝后处理，不修改传入的数组）；为True时直接入库
+        
+        Raises:
+            ValueError: 当分块列表为空或向量数与分块数不一致时
+            Exception: 索引构建过程中的错误
+        
+        Example:
+            >>> embeddings = model.encode_texts([chunk.content for chunk in chunks])
+            >>> store.build_index_from_embeddings(chunks, embeddings)
+        """
+        if not chunks:
+            raise ValueError("分块列表不能为空")
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"向量数 {len(embeddings)} 与分块数 {len(chunks)} 不一致")
+        
+        try:
+            # 入库时做一次L2归一化，内积即余弦相似度，检索时库内向量无需再处理
+            if normalized:
+                embeddings = np.asarray(embeddings, dtype=np.float32)
+            else:
+                embeddings = np.array(embeddings, dtype=np.float32)
+                faiss.normalize_L2(embeddings)
             
-            # 添加向量到索引
-            logger.info("正在构建FAISS索引...")
-            self.index.add(embeddings.astype('float32'))
+            dimension = embeddings.shape[1]
+            self._index_mapped = False
+            if (len(chunks) < FAISS_MIN_BUILD_VECTORS and self.index_type in ("auto", "flat", "sqfp16")
+                    and not self.device.startswith("cuda")):
+                # 分块很少时跳过FAISS，直接用numpy矩阵检索；SQfp16类型先舍入到fp16，
+                # 保证与之后补建的FAISS索引分数一致
+                if self.index_type != "flat":
+                    embeddings = embeddings.astype(np.float16).astype(np.float32)
+                self.index = None
+                self._matrix_t = np.ascontiguousarray(_as_f32(embeddings).T)
+            else:
+                # 创建FAISS索引
+                self.index = self._create_index(dimension)
+                
+                # 添加向量到索引
+                logger.info("正在构建FAISS索引...")
+                self.index.add(_as_f32(embeddings))
+                self._maybe_convert_to_ivf()
+                self._maybe_convert_to_hnsw()
+                self._move_to_device()
+                self._refresh_matrix()
             
             # 存储元数据
-            self.chunk_metadata = {}
-            for i, chunk in enumerate(chunks):
-                self.chunk_metadata[i] = {
-                    'chunk_id': chunk.id,
-                    'content': chunk.content,
-                    'metadata': getattr(chunk, 'metadata', {}),
-                    'source': getattr(chunk, 'source', '')
-                }
-            
-            self.chunk_count = len(chunks)
+            self._reset_chunks()
+            self._query_cache.clear()
+            self._extend_chunks(chunks)
             logger.info(f"向量索引构建完成，包含 {self.chunk_count} 个向量，维度: {dimension}")
             
         except Exception as e:
             logger.error(f"索引构建失败: {str(e)}")
             raise
     
-    def search(self, query: str, top_k: int = 5, similarity_threshold: float = 0.3) -> List[QueryResult]:
+    def _encode_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        向量化构建索引用的文档文本
+        
+        重复的文本（如爬取文档中的页眉页脚）只编码一次，再按原顺序展开，
+        返回的向量仍与texts一一对应。
+        """
+        unique = {}
+        for text in texts:
+            unique.setdefault(text, len(unique))
+        if len(unique) == len(texts):
+            return self.embedding_model.encode_texts(texts)
+        
+        logger.info(f"去除重复文本 {len(texts) - len(unique)} 个，实际编码 {len(unique)} 个")
+        embeddings = self.embedding_model.encode_texts(list(unique))
+        return embeddings[[unique[text] for text in texts]]
+    
+    def build_compressed_index(self, chunks: List[Any], nlist: int = 64, m: int = 8):
+        """
+        用IVF-PQ压缩索引构建向量索引
+        
+        每个向量只保存m个字节的PQ编码（fp32的384维向量为1536字节），索引文件和内存占用大幅减小，
+        检索时用查表法计算近似内积。之后追加分块、保存和加载都沿用该索引类型。
+        
+        Args:
+            chunks (List[Any]): 文档分块列表
+            nlist (int, optional): IVF聚类数，默认为64
+            m (int, optional): PQ子空间数，必须整除向量维度，默认为8
+        
+        Note:
+            向量数少于max(39·nlist, 256)时训练数据不足，保留SQfp16暴力搜索索引
+        
+        Example:
+            >>> store.build_compressed_index(chunks, nlist=64, m=8)
+            >>> store.save_index("data/vectors/compressed_index")
+        """
+        self.index_type = "ivfpq"
+        self.pq_nlist = nlist
+        self.pq_m = m
+        self.build_index(chunks)
+    
+    def build_index_batched(self, chunks: Iterable[Any], batch_size: int = 32) -> int:
+        """
+        分批构建向量索引
+        
+        与build_index功能相同，但接受任意可迭代对象（如生成器），每次只取出一批分块
+        进行向量化并追加到FAISS索引中。处理完的批次不再被引用，适合文档较多、
+        无法一次性将全部分块和向量放入内存的场景。
+        
+        Args:
+            chunks (Iterable[Any]): 文档分块的可迭代对象，分块属性要求同build_index
+            batch_size (int, optional): 每批向量化的分块数量，默认为32
+        
+        Returns:
+            int: 索引中的分块总数
+        
+        Raises:
+            ValueError: 当没有任何分块时
+            Exception: 向量化或索引构建过程中的错误
+        
+        Example:
+            >>> chunk_iter = (c for path in paths for c in processor.process_document(path))
+            >>> store.build_index_batched(chunk_iter, batch_size=32)
+        """
+        try:
+            logger.info(f"开始分批构建向量索引，批大小: {batch_size}")
+            
+            self.index = None
+            self._matrix_t = None
+            self._index_mapped = False
+            self._reset_chunks()
+            self._query_cache.clear()
+            
+            chunk_iter = iter(chunks)
+            while True:
+                batch = list(islice(chunk_iter, batch_size))
+                if not batch:
+                    break
+                
+                # 向量化当前批次
+                embeddings = self._encode_documents([chunk.content for chunk in batch])
+                
+                # 首个批次确定维度后创建FAISS索引
+                if self.index is None:
+                    self.index = self._create_index(embeddings.shape[1])
+                self.index.add(_as_f32(embeddings))
+                
+                self._extend_chunks(batch)
+            
+            if self.index is None:
+                raise ValueError("分块列表不能为空")
+            
+            self._maybe_convert_to_ivf()
+            self._maybe_convert_to_hnsw()
+            self._move_to_device()
+            self._refresh_matrix()
+            
+            logger.info(f"向量索引构建完成，包含 {self.chunk_count} 个向量，维度: {self.index.d}")
+            return self.chunk_count
+            
+        except Exception as e:
+            logger.error(f"索引构建失败: {str(e)}")
+            raise
+    
+    def add_chunks(self, chunks: List[Any]) -> int:
+        """
+        向已有索引追加分块
+        
+        只对新分块向量化并添加到FAISS索引末尾，已有分块无需重新编码。IVF-PQ索引
+        沿用构建时训练好的聚类中心和码本，新增数据分布变化较大时应重新构建。
+        索引尚未构建时等同于build_index。
+        
+        Args:
+            chunks (List[Any]): 新的文档分块列表，分块属性要求同build_index
+        
+        Returns:
+            int: 索引中的分块总数
+        
+        Raises:
+            ValueError: 新向量维度与索引不一致时
+            Exception: 向量化或添加过程中的错误
+        
+        Example:
+            >>> store.load_index("data/vectors/my_index")
+            >>> store.add_chunks(processor.process_document("docs/new.md"))
+            >>> store.save_index("data/vectors/my_index")
+        """
+        if not chunks:
+            return self.chunk_count
+        if not self.is_built():
+            self.build_index(chunks)
+            return self.chunk_count
+        
+        try:
+            logger.info(f"开始追加 {len(chunks)} 个分块")
+            embeddings = _as_f32(self._encode_documents([chunk.content for chunk in chunks]))
+            
+            dimension = self.index.d if self.index is not None else self._matrix_t.shape[0]
+            if embeddings.shape[1] != dimension:
+                raise ValueError(f"向量维度 {embeddings.shape[1]} 与索引维度 {dimension} 不一致")
+            
+            if self.index is None and self.chunk_count + len(chunks) < FAISS_MIN_BUILD_VECTORS:
+                # 仍是小规模索引，直接扩展numpy矩阵
+                if self.index_type != "flat":
+                    embeddings = embeddings.astype(np.float16).astype(np.float32)
+                self._matrix_t = np.ascontiguousarray(np.hstack([self._matrix_t, embeddings.T]))
+            else:
+                self._ensure_faiss_index()
+                if self._index_mapped:
+                    # 内存映射的索引数据只读，先复制到内存中再添加
+                    self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+                    self._index_mapped = False
+                    self._apply_search_settings()
+                self.index.add(embeddings)
+                if self._gpu_resources is None:
+                    self._maybe_convert_to_ivf()
+                    self._maybe_convert_to_hnsw()
+                self._refresh_matrix()
+            
+            self._extend_chunks(chunks)
+            logger.info(f"分块追加完成，索引共包含 {self.chunk_count} 个向量")
+            return self.chunk_count
+            
+        except Exception as e:
+            logger.error(f"分块追加失败: {str(e)}")
+            raise
+    
+    def is_built(self) -> bool:
+        """索引是否已构建或加载（包括只有numpy矩阵的小规模索引）"""
+        return self.index is not None or self._matrix_t is not None
+    
+    def _ensure_faiss_index(self):
+        """小规模构建跳过了FAISS时，按保存的向量矩阵补建FAISS索引"""
+        if self.index is None and self._matrix_t is not None:
+            self.index = self._create_index(self._matrix_t.shape[0])
+            self.index.add(np.ascontiguousarray(self._matrix_t.T))
+    
+    def _create_index(self, dimension: int) -> faiss.Index:
+        """
+        创建用于逐批添加向量的暴力搜索索引
+        
+        fp16标量量化每维只占2字节，内存和检索带宽减半，FAISS内部用SIMD解码回fp32，
+        对归一化后的BGE向量召回几乎没有损失；QT_fp16无需训练。
+        """
+        if self.index_type in ("flat", "ivf"):
+            # IVF-Flat由fp32向量训练，暂存索引也保留fp32
+            return faiss.IndexFlatIP(dimension)
+        if self.index_type == "hnsw":
+            # HNSW无需训练，可以逐批添加向量
+            index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = self.ef_search
+            return index
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    
+    def _maybe_convert_to_ivf(self):
+        """
+        按index_type把构建好的暴力搜索索引转换为IVF索引
+        
+        IVF把向量划分到若干聚类中，检索时只扫描nprobe个聚类：
+        - "ivf": IVF-Flat，nlist≈sqrt(N)，聚类内保存原始fp32向量，分数是精确内积
+        - "ivfpq"/"auto": IVF-PQ，nlist≈4·sqrt(N)，PQ把每个向量压缩为d/4个字节的编码，
+          内存约为fp32向量的1/16（可由pq_nlist、pq_m指定）
+        转换使用已添加的全部向量作为训练集；已经是IVF索引时不做处理。
+        """
+        n = self.index.ntotal
+        if self.index_type not in ("ivf", "ivfpq") and not (self.index_type == "auto" and n > IVFPQ_THRESHOLD):
+            return
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            # 已经是IVF索引（如追加分块时），沿用已训练的结构
+            return
+        
+        d = self.index.d
+        if self.index_type == "ivf":
+            if n < IVF_MIN_VECTORS:
+                logger.info(f"向量数 {n} 较少，继续使用暴力搜索索引")
+                return
+            nlist = max(1, int(np.sqrt(n)))
+            factory = f"IVF{nlist},Flat"
+            logger.info(f"正在训练IVF-Flat索引: nlist={nlist}")
+        else:
+            # 自动选择聚类数时，保证每个聚类中心有足够的训练向量
+            nlist = self.pq_nlist or max(1, min(int(4 * np.sqrt(n)), n // KMEANS_MIN_POINTS_PER_CENTROID))
+            min_vectors = max(KMEANS_MIN_POINTS_PER_CENTROID * nlist, IVFPQ_MIN_VECTORS)
+            if n < min_vectors:
+                logger.warning(f"向量数 {n} 不足以训练IVF-PQ索引（nlist={nlist} 至少需要 {min_vectors} 个），"
+                               f"继续使用暴力搜索索引")
+                return
+            if self.pq_m is not None:
+                if d % self.pq_m != 0:
+                    raise ValueError(f"PQ子空间数 {self.pq_m} 不能整除向量维度 {d}")
+                m = self.pq_m
+            else:
+                # 子空间数取不超过d/4且能整除d的最大值
+                m = next(m for m in range(max(1, d // 4), 0, -1) if d % m == 0)
+            factory = f"IVF{nlist},PQ{m}x8"
+            logger.info(f"正在训练IVF-PQ索引: nlist={nlist}, m={m}")
+        
+        vectors = self.index.reconstruct_n(0, n)
+        index = faiss.index_factory(d, factory, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+        
+        self.index = index
+        self._apply_search_settings()
+    
+    def _maybe_convert_to_hnsw(self):
+        """
+        index_type为"auto"且向量数介于HNSW_THRESHOLD和IVFPQ_THRESHOLD之间时，
+        把构建好的SQfp16暴力搜索索引转换为HNSW索引
+        
+        HNSW图中的向量沿用fp16标量量化存储，分数与SQfp16索引一致；
+        单条查询只访问图中的少量节点，检索时间随数据量对数增长。
+        已经是HNSW索引或索引将放到GPU上（FAISS GPU不支持HNSW）时不做处理。
+        """
+        n = self.index.ntotal
+        if self.index_type != "auto" or not (HNSW_THRESHOLD < n <= IVFPQ_THRESHOLD):
+            return
+        if isinstance(self.index, faiss.IndexHNSW) or self.device.startswith("cuda"):
+            return
+        
+        logger.info(f"正在构建HNSW索引: M={HNSW_M}, efConstruction={HNSW_EF_CONSTRUCTION}")
+        d = self.index.d
+        vectors = self.index.reconstruct_n(0, n)
+        index = faiss.IndexHNSWSQ(d, faiss.ScalarQuantizer.QT_fp16, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        
+        self.index = index
+        self._apply_search_settings()
+    
+    def _move_to_device(self):
+        """
+        按device把索引复制到GPU
+        
+        没有安装faiss-gpu或当前索引类型不支持GPU时，记录警告并继续在CPU上检索。
+        """
+        self._gpu_resources = None
+        if not self.device.startswith("cuda"):
+            return
+        
+        if not hasattr(faiss, "StandardGpuResources"):
+            logger.warning("当前FAISS不支持GPU（未安装faiss-gpu），索引保留在CPU上")
+            return
+        
+        gpu_id = int(self.device.split(":", 1)[1]) if ":" in self.device else 0
+        try:
+            resources = faiss.StandardGpuResources()
+            self.index = faiss.index_cpu_to_gpu(resources, gpu_id, self.index)
+            # 资源对象需要与GPU索引同生命周期
+            self._gpu_resources = resources
+            logger.info(f"索引已复制到GPU: {self.device}")
+        except RuntimeError as e:
+            logger.warning(f"索引复制到GPU失败，继续使用CPU检索: {e}")
+    
+    def _refresh_matrix(self):
+        """
+        为CPU上的小规模暴力搜索索引（Flat/SQfp16）保留一份向量矩阵
+        
+        矩阵由索引重建得到，SQfp16索引重建出的是fp16舍入后的向量，
+        因此numpy检索的分数与FAISS检索一致。矩阵按维度连续存储（转置为(d, N)），
+        矩阵乘法时同一维度的所有向量分量相邻，可以直接做向量化乘加而无需水平归约。
+        """
+        self._matrix_t = None
+        if (isinstance(self.index, (faiss.IndexFlat, faiss.IndexScalarQuantizer))
+                and self.index.ntotal <= NUMPY_SEARCH_MAX_VECTORS):
+            self._matrix_t = np.ascontiguousarray(self.index.reconstruct_n(0, self.index.ntotal).T)
+    
+    def _search_matrix(self, query_embeddings: np.ndarray, top_k: int):
+        """
+        用numpy矩阵乘法检索，返回与faiss.Index.search相同格式的(scores, indices)
+        
+        argpartition只选出前top_k个候选，再对这top_k个排序，无需对全部分数排序。
+        """
+        similarities = query_embeddings @ self._matrix_t
+        k = min(top_k, similarities.shape[1])
+        if k < similarities.shape[1]:
+            # 候选按行号排序，分数相同时靠前的分块排在前面，结果稳定
+            candidates = np.sort(np.argpartition(-similarities, k - 1, axis=1)[:, :k], axis=1)
+        else:
+            candidates = np.broadcast_to(np.arange(k), similarities.shape)
+        candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        return (np.take_along_axis(candidate_scores, order, axis=1),
+                np.take_along_axis(candidates, order, axis=1))
+    
+    def _apply_search_settings(self):
+        """将nprobe设置到IVF索引上、efSearch设置到HNSW索引上（其他索引忽略）"""
+        ivf_index = faiss.try_extract_index_ivf(self.index)
+        if ivf_index is not None:
+            ivf_index.nprobe = self.nprobe
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = self.ef_search
+    
+    def _search_params(self, nprobe: Optional[int], ef_search: Optional[int]):
+        """
+        构造单次检索的参数，不修改索引本身的设置
+        
+        CPU索引未指定时使用本实例的nprobe/ef_search：内存映射加载的索引在多个VectorStore之间共享，
+        检索设置随每次调用传入，不能依赖保存在共享索引对象上的值。GPU索引是本实例独有的副本，
+        只在指定时传入
+        """
+        if self._gpu_resources is None:
+            nprobe = self.nprobe if nprobe is None else nprobe
+            ef_search = self.ef_search if ef_search is None else ef_search
+        if nprobe is not None and faiss.try_extract_index_ivf(self.index) is not None:
+            return faiss.SearchParametersIVF(nprobe=nprobe)
+        if ef_search is not None and isinstance(self.index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search)
+        return None
+    
+    def _reset_chunks(self):
+        """清空分块信息"""
+        self._ids: List[str] = []
+        self._contents: List[str] = []
+        self._metas: List[Dict[str, Any]] = []
+        self._sources: List[str] = []
+        self.chunk_count = 0
+        self.version = next(_INDEX_VERSIONS)
+    
+    def _extend_chunks(self, chunks: List[Any]):
+        """
+        按FAISS行号顺序追加一批分块中需要随索引保存的信息
+        
+        逐列批量扩展，只保留检索结果需要的字段，不持有分块对象本身；
+        检索时仅为命中的top-k行构造结果对象
+        """
+        self._ids.extend([chunk.id for chunk in chunks])
+        self._contents.extend([chunk.content for chunk in chunks])
+        self._metas.extend([getattr(chunk, 'metadata', {}) for chunk in chunks])
+        self._sources.extend([getattr(chunk, 'source', '') for chunk in chunks])
+        self.chunk_count += len(chunks)
+        self.version = next(_INDEX_VERSIONS)
+    
+    @property
+    def chunk_metadata(self) -> Dict[int, Dict[str, Any]]:
+        """按行号组织的分块信息字典（向后兼容，按需从列式存储构建）"""
+        return {
+            i: {'chunk_id': chunk_id, 'content': content, 'metadata': metadata, 'source': source}
+            for i, (chunk_id, content, metadata, source)
+            in enumerate(zip(self._ids, self._contents, self._metas, self._sources))
+        }
+    
+    def search(self, query: str, top_k: int = 5, similarity_threshold: float = 0.3,
+               nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[QueryResult]:
         """
         执行向量检索
         
@@ -163,6 +728,8 @@ class VectorStore:
             top_k (int, optional): 返回的最大结果数量，默认为5
             similarity_threshold (float, optional): 相似度阈值，范围[0,1]，默认0.3
                                                    低于此阈值的结果将被过滤
+            nprobe (int, optional): 本次检索探查的聚类数，仅对IVF索引有效，默认使用self.nprobe
+            ef_search (int, optional): 本次检索的候选队列长度，仅对HNSW索引有效，默认使用self.ef_search
         
         Returns:
             List[QueryResult]: 查询结果列表，按相似度降序排列
@@ -182,41 +749,109 @@ class VectorStore:
             >>> for result in results:
             ...     print(f"相似度: {result.score:.3f}, 内容: {result.content[:50]}...")
         """
-        if self.index is None:
+        if not self.is_built():
             raise ValueError("索引未构建，请先调用 build_index()")
         
         if not query.strip():
             logger.warning("查询文本为空")
             return []
         
+        return self.search_batch([query], top_k, similarity_threshold, nprobe, ef_search)[0]
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, similarity_threshold: float = 0.3,
+                     nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[List[QueryResult]]:
+        """
+        批量执行向量检索
+        
+        一次性向量化所有查询，并通过一次FAISS搜索得到全部结果。相比逐条调用search，
+        模型的分词和前向计算开销被多个查询分摊，FAISS也能用矩阵乘法批量计算相似度。
+        
+        Args:
+            queries (List[str]): 查询文本列表
+            top_k (int, optional): 每个查询返回的最大结果数量，默认为5
+            similarity_threshold (float, optional): 相似度阈值，默认0.3
+            nprobe (int, optional): 本次检索探查的聚类数，仅对IVF索引有效
+            ef_search (int, optional): 本次检索的候选队列长度，仅对HNSW索引有效
+        
+        Returns:
+            List[List[QueryResult]]: 与queries一一对应的结果列表，空查询对应空列表；
+                                    出错时每个查询都返回一个status为"error"的结果
+        
+        Raises:
+            ValueError: 索引未构建时
+        
+        Example:
+            >>> batches = store.search_batch(["什么是RAG？", "什么是向量数据库？"], top_k=3)
+            >>> for results in batches:
+            ...     print(len(results))
+        """
+        if not self.is_built():
+            raise ValueError("索引未构建，请先调用 build_index()")
+        
+        results: List[List[QueryResult]] = [[] for _ in queries]
+        
+        # 空查询不参与向量化，对应位置保持空列表
+        positions = [i for i, query in enumerate(queries) if query.strip()]
+        if len(positions) < len(queries):
+            logger.warning("查询文本为空")
+        if not positions:
+            return results
+        
         try:
-            # 向量化查询
-            query_embedding = self.embedding_model.encode_texts([query])
+            # 批量向量化查询（命中LRU缓存的查询跳过模型计算）
+            query_embeddings = self._encode_queries([queries[i] for i in positions])
             
-            # 执行搜索
-            scores, indices = self.index.search(query_embedding.astype('float32'), top_k)
+            # 执行搜索（IVF索引可按次覆盖nprobe，HNSW索引可按次覆盖efSearch）
+            rows = self._search_vectors(query_embeddings, top_k, similarity_threshold, nprobe, ef_search)
+            for position, row_results in zip(positions, rows):
+                results[position] = row_results
             
-            # 构造结果
-            results = []
-            for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-                if idx == -1:  # FAISS返回-1表示无效结果
-                    continue
-                
-                if score < similarity_threshold:
-                    continue
-                
-                chunk_info = self.chunk_metadata[idx]
-                result = QueryResult(
-                    chunk_id=chunk_info['chunk_id'],
-                    content=chunk_info['content'],
-                    score=float(score),
-                    metadata=chunk_info['metadata']
-                )
-                results.append(result)
-            
-            logger.info(f"检索完成，返回 {len(results)} 个结果")
+            logger.info(f"检索完成，{len(positions)} 个查询共返回 {sum(len(r) for r in results)} 个结果")
             return results
             
+        except Exception as e:
+            logger.error(f"检索失败: {str(e)}")
+            return [[QueryResult(
+                chunk_id="",
+                content="",
+                score=0.0,
+                metadata={},
+                status="error",
+                error_msg=str(e)
+            )] for _ in queries]
+    
+    def search_by_vector(self, query_vector: np.ndarray, top_k: int = 5, similarity_threshold: float = 0.3,
+                         nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[QueryResult]:
+        """
+        用已经向量化的查询执行检索
+        
+        同一查询需要以不同参数多次检索时，可先调用embedding_model.encode_texts得到查询向量，
+        之后每次检索都跳过查询向量化。
+        
+        Args:
+            query_vector (np.ndarray): 标准化的查询向量，形状为 (embedding_dim,)
+            top_k (int, optional): 返回的最大结果数量，默认为5
+            similarity_threshold (float, optional): 相似度阈值，默认0.3
+            nprobe (int, optional): 本次检索探查的聚类数，仅对IVF索引有效
+            ef_search (int, optional): 本次检索的候选队列长度，仅对HNSW索引有效
+        
+        Returns:
+            List[QueryResult]: 查询结果列表，按相似度降序排列；出错时返回一个status为"error"的结果
+        
+        Raises:
+            ValueError: 索引未构建时
+        
+        Example:
+            >>> vector = model.encode_texts(["什么是RAG？"])[0]
+            >>> for threshold in (0.3, 0.5):
+            ...     print(len(store.search_by_vector(vector, similarity_threshold=threshold)))
+        """
+        if not self.is_built():
+            raise ValueError("索引未构建，请先调用 build_index()")
+        
+        try:
+            query_embeddings = _as_f32(np.reshape(query_vector, (1, -1)))
+            return self._search_vectors(query_embeddings, top_k, similarity_threshold, nprobe, ef_search)[0]
         except Exception as e:
             logger.error(f"检索失败: {str(e)}")
             return [QueryResult(
@@ -228,6 +863,116 @@ class VectorStore:
                 error_msg=str(e)
             )]
     
+    def search_batch_by_vectors(self, query_vectors: np.ndarray, top_k: int = 5, similarity_threshold: float = 0.3,
+                                nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[List[QueryResult]]:
+        """
+        用已经向量化的一批查询执行检索
+        
+        多个查询先通过一次encode_texts批量向量化，再用一次FAISS搜索得到全部结果。
+        
+        Args:
+            query_vectors (np.ndarray): 标准化的查询向量矩阵，形状为 (n_queries, embedding_dim)
+            top_k (int, optional): 每个查询返回的最大结果数量，默认为5
+            similarity_threshold (float, optional): 相似度阈值，默认0.3
+            nprobe (int, optional): 本次检索探查的聚类数，仅对IVF索引有效
+            ef_search (int, optional): 本次检索的候选队列长度，仅对HNSW索引有效
+        
+        Returns:
+            List[List[QueryResult]]: 与query_vectors各行一一对应的结果列表；
+                                    出错时每个查询都返回一个status为"error"的结果
+        
+        Raises:
+            ValueError: 索引未构建时
+        
+        Example:
+            >>> vectors = model.encode_texts(["什么是RAG？", "什么是向量数据库？"])
+            >>> for results in store.search_batch_by_vectors(vectors, top_k=3):
+            ...     print(len(results))
+        """
+        if not self.is_built():
+            raise ValueError("索引未构建，请先调用 build_index()")
+        
+        query_embeddings = _as_f32(np.atleast_2d(query_vectors))
+        try:
+            return self._search_vectors(query_embeddings, top_k, similarity_threshold, nprobe, ef_search)
+        except Exception as e:
+            logger.error(f"检索失败: {str(e)}")
+            return [[QueryResult(
+                chunk_id="",
+                content="",
+                score=0.0,
+                metadata={},
+                status="error",
+                error_msg=str(e)
+            )] for _ in range(len(query_embeddings))]
+    
+    def _search_vectors(self, query_embeddings: np.ndarray, top_k: int, similarity_threshold: float,
+                        nprobe: Optional[int], ef_search: Optional[int]) -> List[List[QueryResult]]:
+        """按查询向量检索，返回与每行查询向量对应的结果列表"""
+        if self._matrix_t is not None:
+            # 小规模暴力搜索索引直接用矩阵乘法检索
+            scores, indices = self._search_matrix(_as_f32(query_embeddings), top_k)
+        else:
+            params = self._search_params(nprobe, ef_search)
+            # 少量查询时限制为单线程，检索结束后恢复默认线程数。omp_set_num_threads只修改
+            # 调用线程自己的OpenMP线程数设置，并发检索的其他线程不受影响，无需加锁
+            if len(query_embeddings) < OMP_SINGLE_THREAD_MAX_QUERIES:
+                faiss.omp_set_num_threads(1)
+            try:
+                scores, indices = self.index.search(_as_f32(query_embeddings), top_k, params=params)
+            finally:
+                faiss.omp_set_num_threads(_OMP_MAX_THREADS)
+        
+        # 先用向量化掩码过滤无效结果（FAISS返回-1）和低于阈值的结果，
+        # 只对保留下来的命中构造QueryResult
+        valid = (indices != -1) & (scores >= similarity_threshold)
+        
+        # 构造结果
+        results = []
+        for row_scores, row_indices, row_valid in zip(scores, indices, valid):
+            row_results = []
+            for score, idx in zip(row_scores[row_valid].tolist(), row_indices[row_valid].tolist()):
+                row_results.append(QueryResult(
+                    chunk_id=self._ids[idx],
+                    content=self._contents[idx],
+                    score=score,
+                    metadata=self._metas[idx]
+                ))
+            results.append(row_results)
+        return results
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        向量化查询文本，重复的查询直接使用LRU缓存中的向量
+        
+        模型前向计算是检索中最耗时的步骤，演示、评测和对话场景中重复查询很常见。
+        缓存在构建或加载索引时清空。
+        
+        Args:
+            queries (List[str]): 非空查询文本列表
+        
+        Returns:
+            np.ndarray: 形状为 (len(queries), embedding_dim) 的float32向量数组
+        """
+        cache = self._query_cache
+        vectors = {}
+        missing = []
+        for query in dict.fromkeys(queries):
+            if query in cache:
+                cache.move_to_end(query)
+                vectors[query] = cache[query]
+            else:
+                missing.append(query)
+        
+        if missing:
+            embeddings = self.embedding_model.encode_texts(missing)
+            for query, embedding in zip(missing, embeddings):
+                vectors[query] = cache[query] = np.array(embedding, dtype=np.float32)
+            while len(cache) > QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+        
+        return np.stack([vectors[query] for query in queries])
+    
     def save_index(self, index_path: str):
         """
         保存索引到文件
@@ -249,23 +994,36 @@ class VectorStore:
             >>> store.save_index("data/vectors/my_index")
             # 生成文件: data/vectors/my_index.faiss 和 data/vectors/my_index.pkl
         """
-        if self.index is None:
+        if not self.is_built():
             raise ValueError("索引未构建，无法保存")
+        self._ensure_faiss_index()
         
         try:
             # 确保目录存在
             os.makedirs(os.path.dirname(index_path), exist_ok=True)
             
             # 保存FAISS索引
-            faiss.write_index(self.index, f"{index_path}.faiss")
+            index = self.index
+            if self._gpu_resources is not None:
+                # GPU索引需先复制回CPU才能序列化
+                index = faiss.index_gpu_to_cpu(index)
+            # 写入临时文件后原子替换：其他VectorStore映射的旧索引文件保持有效
+            _write_atomically(f"{index_path}.faiss", lambda path: faiss.write_index(index, path))
             
-            # 保存元数据
+            # 保存元数据（列式的列表结构，用最高pickle协议减少加载时的对象重建开销）
             metadata = {
-                'chunk_metadata': self.chunk_metadata,
-                'chunk_count': self.chunk_count
+                'ids': self._ids,
+                'contents': self._contents,
+                'metadatas': self._metas,
+                'sources': self._sources,
+                'chunk_count': self.chunk_count,
+                'nprobe': self.nprobe,
+                'ef_search': self.ef_search
             }
-            with open(f"{index_path}.pkl", 'wb') as f:
-                pickle.dump(metadata, f)
+            def write_metadata(path: str):
+                with open(path, 'wb') as f:
+                    pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+            _write_atomically(f"{index_path}.pkl", write_metadata)
             
             logger.info(f"索引已保存到: {index_path}")
             
@@ -273,15 +1031,22 @@ class VectorStore:
             logger.error(f"索引保存失败: {str(e)}")
             raise
     
-    def load_index(self, index_path: str):
+    def load_index(self, index_path: str, mmap: bool = True):
         """
         从文件加载索引
         
-        从磁盘加载之前保存的FAISS索引和元数据。
+        从磁盘加载之前保存的FAISS索引和元数据。默认以内存映射（mmap）方式打开
+        FAISS索引文件，向量数据由操作系统按需换入，避免启动时一次性读入全部向量。
         
         Args:
             index_path (str): 索引文件路径（不包含扩展名）
                              需要存在对应的.faiss和.pkl文件
+            mmap (bool, optional): 是否以只读内存映射方式加载FAISS索引，默认为True
+                                  映射加载的索引只读，add_chunks会先把它复制到内存中再添加；
+                                  索引文件不能被原地改写（save_index以原子替换方式写入新文件，
+                                  已映射的旧文件不受影响）。同一文件未修改时重复加载会复用
+                                  已映射的索引。当前FAISS版本不支持映射该索引类型、或加载期间
+                                  文件被重写时自动回退为完整读取
         
         Raises:
             FileNotFoundError: 索引文件不存在时
@@ -296,7 +1061,35 @@ class VectorStore:
             if not os.path.exists(f"{index_path}.faiss"):
                 raise FileNotFoundError(f"索引文件不存在: {index_path}.faiss")
             
-            self.index = faiss.read_index(f"{index_path}.faiss")
+            self.index = None
+            self._matrix_t = None
+            self._index_mapped = False
+            if mmap:
+                faiss_path = os.path.abspath(f"{index_path}.faiss")
+                cache_key = _file_identity(faiss_path)
+                self.index = _MAPPED_INDEX_CACHE.get(cache_key)
+                if self.index is None:
+                    # 文件已被重写时丢弃旧的映射
+                    for key in [key for key in list(_MAPPED_INDEX_CACHE.keys()) if key[0] == faiss_path]:
+                        _MAPPED_INDEX_CACHE.pop(key, None)
+                    # 新版FAISS使用IO_FLAG_MMAP_IFC映射Flat索引数据，旧版本回退到IO_FLAG_MMAP
+                    io_flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+                    try:
+                        self.index = faiss.read_index(faiss_path, io_flags)
+                        if _file_identity(faiss_path) == cache_key:
+                            _MAPPED_INDEX_CACHE[cache_key] = self.index
+                        else:
+                            # 映射期间文件被重写（如其他进程原地写入），映射的数据不可靠，改为完整读取
+                            logger.warning(f"索引文件在加载期间被重写，改为完整读取: {faiss_path}")
+                            self.index = None
+                    except RuntimeError as e:
+                        # 部分FAISS版本只支持映射IVF倒排表，其余索引类型回退为普通读取
+                        logger.warning(f"索引不支持内存映射加载，改为完整读取: {e}")
+                else:
+                    logger.info(f"复用已映射的索引: {faiss_path}")
+                self._index_mapped = self.index is not None
+            if self.index is None:
+                self.index = faiss.read_index(f"{index_path}.faiss")
             
             # 加载元数据
             if not os.path.exists(f"{index_path}.pkl"):
@@ -305,8 +1098,28 @@ class VectorStore:
             with open(f"{index_path}.pkl", 'rb') as f:
                 metadata = pickle.load(f)
             
-            self.chunk_metadata = metadata['chunk_metadata']
+            if 'chunk_metadata' in metadata:
+                # 兼容旧版按行号保存的字典格式
+                chunk_infos = [metadata['chunk_metadata'][i] for i in range(metadata['chunk_count'])]
+                self._ids = [info['chunk_id'] for info in chunk_infos]
+                self._contents = [info['content'] for info in chunk_infos]
+                self._metas = [info['metadata'] for info in chunk_infos]
+                self._sources = [info['source'] for info in chunk_infos]
+            else:
+                self._ids = metadata['ids']
+                self._contents = metadata['contents']
+                self._metas = metadata['metadatas']
+                self._sources = metadata['sources']
+            self._query_cache.clear()
             self.chunk_count = metadata['chunk_count']
+            self.version = next(_INDEX_VERSIONS)
+            self.nprobe = metadata.get('nprobe', self.nprobe)
+            self.ef_search = metadata.get('ef_search', self.ef_search)
+            # 映射的索引可能被其他VectorStore共享，不修改其上的设置（检索时按次传入）
+            if not self._index_mapped:
+                self._apply_search_settings()
+            self._move_to_device()
+            self._refresh_matrix()
             
             logger.info(f"索引加载成功，包含 {self.chunk_count} 个向量")
             
@@ -314,6 +1127,16 @@ class VectorStore:
             logger.error(f"索引加载失败: {str(e)}")
             raise
     
+    def _index_size(self) -> int:
+        """索引大小（字节）：按每个向量的编码字节数计算，HNSW等不支持时按序列化大小计算"""
+        try:
+            return self.index.ntotal * self.index.sa_code_size()
+        except RuntimeError:
+            index = self.index
+            if self._gpu_resources is not None:
+                index = faiss.index_gpu_to_cpu(index)
+            return faiss.serialize_index(index).nbytes
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         获取向量存储统计信息
@@ -325,17 +1148,18 @@ class VectorStore:
                            - dimension: 向量维度
                            - is_trained: 索引是否已训练
         """
-        if self.index is None:
+        if not self.is_built():
             return {
                 'total_vectors': 0,
                 'index_size': 0,
                 'dimension': 0,
                 'is_trained': False
             }
+        self._ensure_faiss_index()
         
         return {
             'total_vectors': self.index.ntotal,
-            'index_size': self.index.ntotal * self.index.d * 4,  # 假设float32
+            'index_size': self._index_size(),
             'dimension': self.index.d,
             'is_trained': self.index.is_trained
         }
\ No newline at end of file
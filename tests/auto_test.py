@@ -4,6 +4,7 @@ RAG系统自动化测试脚本
 使用subprocess和管道进行自动化交互测试
 """
 
+import codecs
 import subprocess
 import time
 import threading
@@ -11,6 +12,62 @@ import queue
 import sys
 import os
 
+# 交互提示符，出现即表示系统已就绪、可以接收下一个问题
+READY_MARKER = "请输入您的问题"
+
+# 管道缓冲区大小（1 MiB），避免长回答输出时子进程因管道写满而阻塞
+PIPE_SIZE = 1 << 20
+F_SETPIPE_SZ = 1031  # Linux fcntl命令号
+
+def _set_pipe_size(*streams):
+    """在Python 3.10以下通过fcntl调大管道缓冲区（仅Linux支持，其他平台忽略）"""
+    try:
+        import fcntl
+    except ImportError:
+        return
+    for stream in streams:
+        try:
+            fcntl.fcntl(stream.fileno(), F_SETPIPE_SZ, PIPE_SIZE)
+        except OSError:
+            pass
+
+def _start_reader(stream) -> queue.Queue:
+    """
+    启动后台线程持续读取子进程管道输出
+    
+    按块读取而非按行读取：input()的提示符不带换行符，按行读取会一直阻塞。
+    持续排空管道也可避免管道写满导致子进程阻塞。
+    
+    Args:
+        stream: 子进程的stdout或stderr文本流
+        
+    Returns:
+        queue.Queue: 输出文本块队列，读到EOF时放入None
+    """
+    q = queue.Queue()
+    
+    def pump():
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        for data in iter(lambda: stream.buffer.read1(4096), b''):
+            q.put(decoder.decode(data))
+        q.put(None)
+    
+    threading.Thread(target=pump, daemon=True).start()
+    return q
+
+def _drain(q: queue.Queue, timeout: float = 5) -> str:
+    """取出队列中剩余的全部输出，直到读到EOF或超时"""
+    parts = []
+    while True:
+        try:
+            chunk = q.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if chunk is None:
+            break
+        parts.append(chunk)
+    return "".join(parts)
+
 def run_rag_test():
     """运行RAG系统并进行自动化测试"""
     print("🚀 启动RAG系统自动化测试...")
@@ -21,22 +78,50 @@ def run_rag_test():
         "quit"  # 退出命令
     ]
     
+    stdout_parts = []
+    
     try:
         # 启动RAG系统进程
         print("📱 启动RAG系统进程...")
+        popen_kwargs = {}
+        if sys.version_info >= (3, 10):
+            popen_kwargs['pipesize'] = PIPE_SIZE
         process = subprocess.Popen(
             ["python", "main.py"],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
-            bufsize=1,
+            bufsize=1,  # 行缓冲，保持交互语义
             universal_newlines=True,
-            cwd="/Users/xt/Desktop/code/trae/921_Rag1/rag_learning_system"
+            cwd="/Users/xt/Desktop/code/trae/921_Rag1/rag_learning_system",
+            **popen_kwargs
         )
+        if 'pipesize' not in popen_kwargs:
+            _set_pipe_size(process.stdout, process.stderr)
+        stdout_queue = _start_reader(process.stdout)
+        stderr_queue = _start_reader(process.stderr)
+        
+        def wait_for(marker: str, timeout: float):
+            """读取标准输出直到出现marker，超时抛出TimeoutExpired"""
+            deadline = time.monotonic() + timeout
+            pending = ""
+            while marker not in pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+                try:
+                    chunk = stdout_queue.get(timeout=remaining)
+                except queue.Empty:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+                if chunk is None:
+                    raise RuntimeError("RAG系统进程提前退出")
+                stdout_parts.append(chunk)
+                # 只保留末尾部分，防止marker被拆分在两个块之间
+                pending = pending[-len(marker):] + chunk
         
         print("⏳ 等待系统初始化...")
-        time.sleep(10)  # 等待系统完全启动
+        wait_for(READY_MARKER, 30)  # 等待系统完全启动
         
         print("🔍 开始发送测试问题...")
         
@@ -52,16 +137,19 @@ def run_rag_test():
             
             if question != "quit":
                 print("⏳ 等待系统响应...")
-                time.sleep(5)  # 等待响应
+                wait_for(READY_MARKER, 30)  # 等待响应
         
         # 等待进程结束
         print("\n⏳ 等待进程结束...")
-        stdout, stderr = process.communicate(timeout=30)
+        process.stdin.close()
+        process.wait(timeout=30)
+        stdout_parts.append(_drain(stdout_queue))
+        stderr = _drain(stderr_queue)
         
         print("\n📊 测试结果:")
         print("=" * 50)
         print("标准输出:")
-        print(stdout)
+        print("".join(stdout_parts))
         
         if stderr:
             print("\n错误输出:")
@@ -72,9 +160,10 @@ def run_rag_test():
     except subprocess.TimeoutExpired:
         print("⚠️ 进程超时，强制终止...")
         process.kill()
-        stdout, stderr = process.communicate()
+        process.wait()
+        stdout_parts.append(_drain(stdout_queue))
         print("超时前的输出:")
-        print(stdout)
+        print("".join(stdout_parts))
         
     except Exception as e:
         print(f"❌ 测试过程中出错: {e}")
@@ -89,4 +178,4 @@ if __name__ == "__main__":
     print("🔧 激活虚拟环境...")
     os.system("source venv/bin/activate")
     
-    run_rag_test()
\ No newline at end of file
+    run_rag_test()
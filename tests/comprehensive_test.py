@@ -5,12 +5,43 @@ RAG学习系统 - 综合功能测试脚本
 测试系统的完整问答功能，验证检索和生成质量
 """
 
+import os
+import select
 import time
-import subprocess
 import threading
 import queue
 import sys
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+# 读取日志末尾时最多读入的字节数
+_TAIL_BYTES = 8192
+
+# 等待用户按Enter的秒数，超时后自动继续下一个测试
+_PROMPT_TIMEOUT = 2.0
+
+
+def _wait_or_timeout(prompt: str, timeout: float = _PROMPT_TIMEOUT) -> Optional[str]:
+    """
+    提示并等待用户输入一行，超时后返回None
+    
+    设置了CI环境变量时不等待，测试可以无人值守地运行
+    """
+    print(prompt, flush=True)
+    if os.environ.get('CI'):
+        return None
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    return sys.stdin.readline() if ready else None
+
+
+def _tail(path: str, n: int = 20) -> str:
+    """在进程内读取文件的最后n行，只读取文件末尾的一小段"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - _TAIL_BYTES))
+        data = f.read()
+    return b'\n'.join(data.splitlines()[-n:]).decode('utf-8', 'replace')
+
 
 class RAGSystemTester:
     """RAG系统测试器"""
@@ -49,8 +80,8 @@ class RAGSystemTester:
             print(f"   {question}")
             print("\n⏳ 请在终端4输入上述问题，然后按Enter继续下一个测试...")
             
-            # 等待用户确认
-            input("   按Enter键继续下一个测试...")
+            # 等待用户确认，超时自动继续
+            _wait_or_timeout(f"   按Enter键继续下一个测试（{_PROMPT_TIMEOUT:.0f}秒后自动继续）...")
         
         print("\n✅ 所有测试问题已列出完成！")
         print("\n📊 请验证以下功能点：")
@@ -64,20 +95,17 @@ class RAGSystemTester:
         """检查系统日志"""
         print("\n📋 检查系统运行日志...")
         try:
-            result = subprocess.run(
-                ["tail", "-20", "rag_system.log"],
-                capture_output=True,
-                text=True,
-                cwd="/Users/xt/Desktop/code/trae/921_Rag1/rag_learning_system"
-            )
+            log_path = os.path.join("/Users/xt/Desktop/code/trae/921_Rag1/rag_learning_system", "rag_system.log")
             
-            if result.returncode == 0:
+            try:
+                logs = _tail(log_path, 20)
+            except OSError:
+                print("❌ 无法读取系统日志")
+            else:
                 print("📄 最新系统日志：")
                 print("-" * 40)
-                print(result.stdout)
+                print(logs)
                 print("-" * 40)
-            else:
-                print("❌ 无法读取系统日志")
                 
         except Exception as e:
             print(f"❌ 日志检查失败: {e}")
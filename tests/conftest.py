@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pytest共享夹具
+
+嵌入模型加载较慢（读取权重、初始化PyTorch），整个测试会话只加载一次，
+各测试脚本中的测试函数通过参数共享同一个模型和向量存储
+"""
+
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+# 项目根目录由pytest.ini中的pythonpath加入Python路径
+from src.config_manager import ConfigManager
+
+# 嵌入模型和向量存储会引入PyTorch和FAISS，在夹具内导入，只收集测试或只运行不依赖模型的测试时不加载
+if TYPE_CHECKING:
+    from src.embedding_model import EmbeddingModel
+    from src.vector_store import VectorStore
+
+# 构建共享向量存储使用的测试文档
+TEST_DOCUMENT_PATH = "data/documents/test_document.md"
+
+# 测试专用的向量缓存目录，与生产环境配置中的缓存目录（cache_path）分开
+TEST_EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+
+
+@pytest.fixture(scope="session")
+def config_manager() -> ConfigManager:
+    """已加载配置的配置管理器，整个测试会话共享"""
+    manager = ConfigManager()
+    manager.load_config()
+    return manager
+
+
+@pytest.fixture(scope="session")
+def embedding_model(config_manager: ConfigManager) -> "EmbeddingModel":
+    """
+    按配置加载的嵌入模型，整个测试会话共享；加载失败时跳过依赖它的测试
+    
+    配置启用缓存时使用测试专用的向量缓存目录（不读写生产环境的缓存），
+    测试文档未修改时，再次运行测试直接从缓存读取向量，跳过模型前向计算
+    """
+    from src.embedding_model import EmbeddingModel
+    
+    config = config_manager.get_config()
+    model = EmbeddingModel(
+        model_name=config.embedding_model_name,
+        device=config.embedding_device,
+        cache_dir=TEST_EMBEDDING_CACHE_DIR if config.cache_enabled else None
+    )
+    if not model.load_model():
+        pytest.skip(f"嵌入模型加载失败: {config.embedding_model_name}")
+    return model
+
+
+@pytest.fixture(scope="session")
+def embedding_service(embedding_model: "EmbeddingModel") -> "EmbeddingModel":
+    """embedding_model的别名，对应旧测试脚本中的参数名"""
+    return embedding_model
+
+
+@pytest.fixture(scope="session")
+def vector_store(embedding_model: "EmbeddingModel") -> "VectorStore":
+    """由测试文档构建的向量存储，整个测试会话共享"""
+    from src.document_processor import DocumentProcessor
+    from src.vector_store import VectorStore
+    
+    if not os.path.exists(TEST_DOCUMENT_PATH):
+        pytest.skip(f"测试文档不存在: {TEST_DOCUMENT_PATH}")
+    
+    chunks = DocumentProcessor(chunk_size=300, chunk_overlap=50).process_document(TEST_DOCUMENT_PATH)
+    store = VectorStore(embedding_model)
+    store.build_index(chunks)
+    return store
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置管理器测试脚本
+
+在临时目录中写入配置文件，检查YAML解析缓存与环境变量覆盖的配合
+"""
+
+import sys
+import os
+
+import pytest
+
+# 添加src目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config_manager import ConfigManager
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch) -> str:
+    """在临时目录中写入配置文件并切换到该目录（Config会在当前目录下创建数据路径），清除相关环境变量"""
+    monkeypatch.chdir(tmp_path)
+    for name in ("LOG_LEVEL", "CACHE_ENABLED"):
+        monkeypatch.delenv(name, raising=False)
+    path = tmp_path / "config.yaml"
+    path.write_text("system:\n  log_level: INFO\n  cache_enabled: false\n", encoding="utf-8")
+    return str(path)
+
+def test_env_overrides_applied_on_cached_yaml(config_path, monkeypatch):
+    """配置文件未变化时复用解析结果，但环境变量覆盖每次加载都重新应用"""
+    monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+    first = ConfigManager(config_path).load_config()
+    
+    monkeypatch.setenv("LOG_LEVEL", "ERROR")
+    monkeypatch.setenv("CACHE_ENABLED", "true")
+    second = ConfigManager(config_path).load_config()
+    
+    assert first.log_level == "DEBUG"
+    assert second.log_level == "ERROR"
+    assert second.cache_enabled is True
+
+def test_each_manager_gets_own_config(config_path):
+    """不同的配置管理器不共享同一个可变的Config对象"""
+    first = ConfigManager(config_path).load_config()
+    second = ConfigManager(config_path).load_config()
+    
+    assert first is not second
+    first.log_level = "CRITICAL"
+    assert second.log_level == "INFO"
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -5,12 +5,15 @@
 
 import sys
 import os
-from pathlib import Path
+from collections import ChainMap
+
+import numpy as np
+import pytest
 
 # 添加src目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.document_processor import DocumentProcessor
+from src.document_processor import DocumentProcessor, DocumentChunk
 
 def test_document_processor():
     """测试文档处理器功能"""
@@ -26,54 +29,62 @@ def test_document_processor():
     test_doc_path = "data/documents/test_document.md"
     
     if not os.path.exists(test_doc_path):
-        print(f"❌ 测试文档不存在: {test_doc_path}")
-        return
+        pytest.skip(f"测试文档不存在: {test_doc_path}")
+    
+    print(f"📄 加载文档: {test_doc_path}")
+    
+    # 加载文档
+    content = processor.load_document(test_doc_path)
+    assert content, "文档内容不能为空"
+    print(f"✅ 文档加载成功，长度: {len(content)} 字符\n")
+    
+    # 处理文档
+    print("🔄 开始处理文档...")
+    chunks = processor.process_document(test_doc_path)
+    assert chunks, "文档处理后应生成分块"
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks))), "分块序号应连续"
+    
+    print(f"✅ 文档处理完成，生成 {len(chunks)} 个分块\n")
+    
+    # 显示分块信息
+    print("📊 分块详情:")
+    print("-" * 80)
+    
+    for i, chunk in enumerate(chunks[:5]):  # 只显示前5个分块
+        print(f"分块 {chunk.chunk_index + 1}:")
+        print(f"  - 长度: {len(chunk.content)} 字符")
+        print(f"  - 来源: {chunk.metadata.get('source', test_doc_path)}")
+        print(f"  - 标题: {chunk.metadata.get('title', 'N/A')}")
+        print(f"  - 内容预览: {chunk.content[:100]}...")
+        print()
+    
+    if len(chunks) > 5:
+        print(f"... 还有 {len(chunks) - 5} 个分块")
+    
+    print("-" * 80)
+    
+    # 统计信息
+    lengths = np.fromiter((len(chunk.content) for chunk in chunks), dtype=np.int64, count=len(chunks))
+    total_chars = int(lengths.sum())
+    avg_chunk_size = float(lengths.mean()) if chunks else 0
+    
+    print(f"\n📈 统计信息:")
+    print(f"  - 总分块数: {len(chunks)}")
+    print(f"  - 总字符数: {total_chars}")
+    print(f"  - 平均分块大小: {avg_chunk_size:.1f} 字符")
+    print(f"  - 原文档大小: {len(content)} 字符")
+    print(f"  - 处理效率: {(total_chars/len(content)*100):.1f}%")
+
+def test_document_chunk_hashable():
+    """分块的元数据为ChainMap等不可哈希的映射时，分块仍可哈希，相同的分块哈希值相同"""
+    def make_chunk():
+        return DocumentChunk(id="c0", content="内容", metadata=ChainMap({"chunk_id": "c0"}, {"source": "a.md"}),
+                             source_file="a.md", chunk_index=0, start_pos=0, end_pos=2)
     
-    try:
-        print(f"📄 加载文档: {test_doc_path}")
-        
-        # 加载文档
-        content = processor.load_document(test_doc_path)
-        print(f"✅ 文档加载成功，长度: {len(content)} 字符\n")
-        
-        # 处理文档
-        print("🔄 开始处理文档...")
-        chunks = processor.process_document(test_doc_path)
-        
-        print(f"✅ 文档处理完成，生成 {len(chunks)} 个分块\n")
-        
-        # 显示分块信息
-        print("📊 分块详情:")
-        print("-" * 80)
-        
-        for i, chunk in enumerate(chunks[:5]):  # 只显示前5个分块
-            print(f"分块 {chunk.chunk_index + 1}:")
-            print(f"  - 长度: {len(chunk.content)} 字符")
-            print(f"  - 来源: {chunk.metadata.get('source', test_doc_path)}")
-            print(f"  - 标题: {chunk.metadata.get('title', 'N/A')}")
-            print(f"  - 内容预览: {chunk.content[:100]}...")
-            print()
-        
-        if len(chunks) > 5:
-            print(f"... 还有 {len(chunks) - 5} 个分块")
-        
-        print("-" * 80)
-        
-        # 统计信息
-        total_chars = sum(len(chunk.content) for chunk in chunks)
-        avg_chunk_size = total_chars / len(chunks) if chunks else 0
-        
-        print(f"\n📈 统计信息:")
-        print(f"  - 总分块数: {len(chunks)}")
-        print(f"  - 总字符数: {total_chars}")
-        print(f"  - 平均分块大小: {avg_chunk_size:.1f} 字符")
-        print(f"  - 原文档大小: {len(content)} 字符")
-        print(f"  - 处理效率: {(total_chars/len(content)*100):.1f}%")
-        
-    except Exception as e:
-        print(f"❌ 测试失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    assert make_chunk() == make_chunk()
+    assert hash(make_chunk()) == hash(make_chunk())
+    assert len({make_chunk(), make_chunk()}) == 1
 
 if __name__ == "__main__":
-    test_document_processor()
\ No newline at end of file
+    test_document_processor()
+    test_document_chunk_hashable()
\ No newline at end of file
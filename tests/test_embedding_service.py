@@ -6,189 +6,243 @@
 
 import sys
 import os
-from pathlib import Path
+import tempfile
+
+import numpy as np
+import pytest
 
 # 添加src目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# 向量存储、嵌入模型会引入FAISS和PyTorch，只在需要它们的测试函数内导入
+from src.config_manager import ConfigManager
 from src.document_processor import DocumentProcessor
-from src.embedding_model import EmbeddingModel
-from src.vector_store import VectorStore
-from src.retriever import RAGRetriever
 
-def test_embedding_service():
-    """测试嵌入服务"""
+# 本模块的测试都依赖嵌入模型，整体标记为重量级测试
+pytestmark = pytest.mark.heavy
+
+# 构建向量存储使用的测试文档（与conftest中共享向量存储夹具使用的文档相同）
+TEST_DOCUMENT_PATH = "data/documents/test_document.md"
+
+# bf16推理向量与fp32推理向量允许的最大余弦偏差（1 - 余弦相似度）
+BF16_MAX_COSINE_DEVIATION = 1e-3
+
+# 测试专用的向量缓存目录（与conftest中嵌入模型夹具使用的目录相同）
+TEST_EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+
+def build_test_vector_store(embedding_model):
+    """用测试文档构建向量存储（与conftest中的vector_store夹具相同），直接运行脚本时使用"""
+    from src.vector_store import VectorStore
+    
+    processor = DocumentProcessor(chunk_size=300, chunk_overlap=50)
+    chunks = processor.process_document(TEST_DOCUMENT_PATH)
+    vector_store = VectorStore(embedding_model)
+    vector_store.build_index(chunks)
+    return vector_store
+
+def test_embedding_service(embedding_service):
+    """测试嵌入服务（embedding_service为已加载的嵌入模型，pytest下由conftest的会话级夹具提供）"""
     print("=== 嵌入服务测试 ===\n")
     
-    try:
-        # 初始化嵌入服务
-        embedding_service = EmbeddingService()
-        
-        # 测试单个文本向量化
-        test_text = "这是一个测试文本，用于验证嵌入功能。"
-        print(f"📝 测试文本: {test_text}")
-        
-        embedding = embedding_service.encode_texts([test_text])
-        print(f"✅ 单文本向量化成功，维度: {embedding.shape}")
-        
-        # 测试批量文本向量化
-        test_texts = [
-            "RAG是一种结合检索和生成的AI技术。",
-            "文档分块是RAG系统的重要步骤。",
-            "向量化可以将文本转换为数值表示。",
-            "FAISS是一个高效的相似度检索库。"
-        ]
-        
-        print(f"\n📚 测试批量向量化，文本数量: {len(test_texts)}")
-        embeddings = embedding_service.encode_texts(test_texts)
-        print(f"✅ 批量向量化成功，形状: {embeddings.shape}")
-        
-        return embedding_service
-        
-    except Exception as e:
-        print(f"❌ 嵌入服务测试失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+    # 测试单个文本向量化
+    test_text = "这是一个测试文本，用于验证嵌入功能。"
+    print(f"📝 测试文本: {test_text}")
+    
+    embedding = embedding_service.encode_texts([test_text])
+    assert embedding.ndim == 2 and embedding.shape[0] == 1, f"单文本向量形状错误: {embedding.shape}"
+    print(f"✅ 单文本向量化成功，维度: {embedding.shape}")
+    
+    # 测试批量文本向量化
+    test_texts = [
+        "RAG是一种结合检索和生成的AI技术。",
+        "文档分块是RAG系统的重要步骤。",
+        "向量化可以将文本转换为数值表示。",
+        "FAISS是一个高效的相似度检索库。"
+    ]
+    
+    print(f"\n📚 测试批量向量化，文本数量: {len(test_texts)}")
+    embeddings = embedding_service.encode_texts(test_texts)
+    assert embeddings.shape == (len(test_texts), embedding.shape[1]), f"批量向量形状错误: {embeddings.shape}"
+    print(f"✅ 批量向量化成功，形状: {embeddings.shape}")
+
+def test_parallel_encoding_matches_serial(embedding_service, monkeypatch):
+    """CPU上分批并行编码（先在当前线程分词，只并行前向计算）的结果应与串行编码一致"""
+    import torch
+    from src.embedding_model import PARALLEL_ENCODE_MIN_TEXTS
+    
+    if embedding_service.device != "cpu":
+        pytest.skip("并行编码只用于CPU")
+    texts = [f"第{i}段测试文本：" + "检索增强生成" * (i % 13) for i in range(PARALLEL_ENCODE_MIN_TEXTS + 100)]
+    serial = embedding_service._encode(texts)
+    
+    # 模拟有空闲核的机器，使编码走并行路径；PyTorch的线程数不应被修改
+    torch_threads = torch.get_num_threads()
+    monkeypatch.setattr(os, "cpu_count", lambda: 2 * torch_threads)
+    parallel = embedding_service._encode(texts)
+    
+    assert torch.get_num_threads() == torch_threads, "并行编码不应修改PyTorch线程数"
+    assert np.allclose(parallel, serial, atol=1e-5), "并行编码结果与串行编码不一致"
+
+def test_embedding_model_bf16(embedding_service):
+    """测试CPU上bfloat16推理与fp32推理的向量一致性（当前CPU不支持bf16指令时跳过）"""
+    from src.embedding_model import EmbeddingModel
+    
+    print("\n=== bf16嵌入模型测试 ===\n")
+    
+    bf16_model = EmbeddingModel(model_name=embedding_service.model_name, device=embedding_service.device, bf16=True)
+    assert bf16_model.load_model(), "bf16嵌入模型加载失败"
+    if not bf16_model.bf16:
+        pytest.skip("当前设备不支持bf16推理")
+    
+    test_texts = [
+        "什么是机器学习？",
+        "深度学习和机器学习有什么关系？",
+        "RAG是一种结合检索和生成的AI技术。",
+        "FAISS是一个高效的相似度检索库。"
+    ]
+    fp32_vectors = embedding_service.encode_texts(test_texts)
+    bf16_vectors = bf16_model.encode_texts(test_texts)
+    max_diff = float(np.max(1.0 - np.sum(fp32_vectors * bf16_vectors, axis=1)))
+    print(f"最大余弦偏差: {max_diff:.6f}")
+    assert max_diff < BF16_MAX_COSINE_DEVIATION, f"bf16向量与fp32偏差过大: {max_diff:.6f}"
 
 def test_vector_store(embedding_service):
     """测试向量存储"""
     print("\n=== 向量存储测试 ===\n")
     
-    try:
-        # 初始化文档处理器
-        processor = DocumentProcessor(chunk_size=300, chunk_overlap=50)
-        
-        # 处理测试文档
-        test_doc_path = "data/documents/test_document.md"
-        if not os.path.exists(test_doc_path):
-            print(f"❌ 测试文档不存在: {test_doc_path}")
-            return None
-        
-        chunks = processor.process_document(test_doc_path)
-        print(f"📄 加载文档分块: {len(chunks)} 个")
-        
-        # 初始化向量存储
-        vector_store = VectorStore(embedding_service)
-        
-        # 构建索引
-        print("🔄 构建向量索引...")
-        vector_store.build_index(chunks)
-        print("✅ 索引构建成功")
-        
-        # 获取统计信息
-        stats = vector_store.get_stats()
-        print(f"📊 向量存储统计:")
-        print(f"  - 总分块数: {stats['total_chunks']}")
-        print(f"  - 索引大小: {stats['index_size']}")
-        print(f"  - 嵌入维度: {stats['embedding_dim']}")
-        
-        return vector_store
-            
-    except Exception as e:
-        print(f"❌ 向量存储测试失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+    # 处理测试文档
+    if not os.path.isfile(TEST_DOCUMENT_PATH):
+        pytest.skip(f"测试文档不存在: {TEST_DOCUMENT_PATH}")
+    
+    # 构建索引
+    print("🔄 构建向量索引...")
+    vector_store = build_test_vector_store(embedding_service)
+    assert vector_store.is_built(), "索引构建后应可检索"
+    print(f"✅ 索引构建成功，共 {vector_store.chunk_count} 个分块")
+    
+    # 获取统计信息
+    stats = vector_store.get_stats()
+    assert stats['total_vectors'] == vector_store.chunk_count, "索引向量数应与分块数一致"
+    assert stats['dimension'] == embedding_service.embedding_dim, "索引维度应与嵌入维度一致"
+    print(f"📊 向量存储统计:")
+    print(f"  - 总向量数: {stats['total_vectors']}")
+    print(f"  - 索引大小: {stats['index_size']}")
+    print(f"  - 嵌入维度: {stats['dimension']}")
 
 def test_retrieval(vector_store):
     """测试检索功能"""
     print("\n=== 检索功能测试 ===\n")
     
-    try:
-        # 测试查询
-        test_queries = [
-            "什么是RAG技术？",
-            "如何进行文档分块？",
-            "BGE模型的特点",
-            "向量化的作用"
-        ]
-        
-        for i, query in enumerate(test_queries, 1):
-            print(f"🔍 查询 {i}: {query}")
-            
-            results = vector_store.search(query, top_k=3)
-            
-            if results:
-                print(f"✅ 找到 {len(results)} 个相关结果:")
-                for j, result in enumerate(results, 1):
-                    print(f"  {j}. 相似度: {result.score:.3f}")
-                    print(f"     内容: {result.content[:100]}...")
-                    print(f"     来源: {result.metadata.get('source', '未知')}")
-                print()
-            else:
-                print("❌ 未找到相关结果\n")
+    # 测试查询
+    test_queries = [
+        "什么是RAG技术？",
+        "如何进行文档分块？",
+        "BGE模型的特点",
+        "向量化的作用"
+    ]
+    
+    # 所有查询一次性批量向量化并批量检索，循环只负责输出
+    results_batch = vector_store.search_batch(test_queries, top_k=3)
+    assert len(results_batch) == len(test_queries), "每个查询应对应一组结果"
+    
+    for i, (query, results) in enumerate(zip(test_queries, results_batch), 1):
+        print(f"🔍 查询 {i}: {query}")
         
-        return True
+        assert all(result.status == "success" for result in results), f"检索出错: {query}"
+        assert len(results) <= 3, f"结果数量超过top_k: {query}"
         
-    except Exception as e:
-        print(f"❌ 检索测试失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
+        if results:
+            print(f"✅ 找到 {len(results)} 个相关结果:")
+            for j, result in enumerate(results, 1):
+                print(f"  {j}. 相似度: {result.score:.3f}")
+                print(f"     内容: {result.content[:100]}...")
+                print(f"     来源: {result.metadata.get('source', '未知')}")
+            print()
+        else:
+            print("❌ 未找到相关结果\n")
 
 def test_index_persistence(vector_store):
     """测试索引持久化"""
+    from src.vector_store import VectorStore
+    
     print("=== 索引持久化测试 ===\n")
     
-    try:
-        # 保存索引
+    # 保存索引（写入临时目录，离开with块时删除）
+    with tempfile.TemporaryDirectory() as tmp_dir:
         print("💾 保存索引...")
-        vector_store.save_index("test_index")
+        index_path = os.path.join(tmp_dir, "test_index")
+        vector_store.save_index(index_path)
         print("✅ 索引保存成功")
         
-        # 创建新的向量存储实例
-        new_embedding_service = EmbeddingService()
-        new_vector_store = VectorStore(new_embedding_service)
+        # 创建新的向量存储实例（模型权重相同，直接复用已加载的嵌入模型）
+        new_vector_store = VectorStore(vector_store.embedding_model)
         
         # 加载索引
         print("📂 加载索引...")
-        new_vector_store.load_index("test_index")
+        new_vector_store.load_index(index_path)
+        assert new_vector_store.chunk_count == vector_store.chunk_count, "加载后的分块数应与保存前一致"
         print("✅ 索引加载成功")
         
-        # 测试加载后的检索功能
+        # 测试加载后的检索功能（默认以内存映射方式加载，需在删除索引文件前完成）
         test_query = "RAG技术的应用"
         results = new_vector_store.search(test_query, top_k=2)
-        
-        if results:
-            print(f"✅ 加载后检索正常，找到 {len(results)} 个结果")
-            return True
-        else:
-            print("❌ 加载后检索失败")
-            return False
-            
+        assert results, "加载后检索失败"
+        print(f"✅ 加载后检索正常，找到 {len(results)} 个结果")
+
+def run_test(test_func, *args) -> bool:
+    """直接运行脚本时执行单项测试，断言失败或出现异常时记为失败"""
+    try:
+        test_func(*args)
+        return True
+    except pytest.skip.Exception as e:
+        print(f"⏭️ {test_func.__name__} 跳过: {e}")
+        return True
     except Exception as e:
-        print(f"❌ 索引持久化测试失败: {str(e)}")
+        print(f"❌ {test_func.__name__} 失败: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
 
 def main():
     """主测试函数"""
+    from src.embedding_model import EmbeddingModel
+    
     print("🚀 开始嵌入和检索模块测试\n")
     
+    # 加载嵌入模型（只加载一次，各项测试共用；启用测试专用的向量缓存，未修改的文本再次运行时不重复编码）
+    config = ConfigManager().get_config()
+    embedding_model = EmbeddingModel(cache_dir=TEST_EMBEDDING_CACHE_DIR if config.cache_enabled else None)
+    if not embedding_model.load_model():
+        print("❌ 嵌入模型加载失败")
+        return
+    
     # 测试嵌入服务
-    embedding_service = test_embedding_service()
-    if not embedding_service:
+    if not run_test(test_embedding_service, embedding_model):
+        return
+    
+    # 测试bf16推理
+    if not run_test(test_embedding_model_bf16, embedding_model):
         return
     
     # 测试向量存储
-    vector_store = test_vector_store(embedding_service)
-    if not vector_store:
+    if not os.path.isfile(TEST_DOCUMENT_PATH):
+        print(f"❌ 测试文档不存在: {TEST_DOCUMENT_PATH}")
+        return
+    if not run_test(test_vector_store, embedding_model):
         return
     
+    # 检索和持久化测试共用一个向量存储
+    vector_store = build_test_vector_store(embedding_model)
+    
     # 测试检索功能
-    retrieval_success = test_retrieval(vector_store)
-    if not retrieval_success:
+    if not run_test(test_retrieval, vector_store):
         return
     
     # 测试索引持久化
-    persistence_success = test_index_persistence(vector_store)
-    
-    if persistence_success:
+    if run_test(test_index_persistence, vector_store):
         print("🎉 所有测试通过！嵌入和检索模块功能正常。")
     else:
         print("⚠️  部分测试失败，请检查日志。")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
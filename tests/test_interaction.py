@@ -95,7 +95,7 @@ def test_system_initialization():
         }
         
     except Exception as e:
-        logger.error(f"❌ 系统初始化失败: {e}")
+        logger.error("❌ 系统初始化失败: %s", e)
         return None
 
 def test_document_processing(components):
@@ -111,30 +111,32 @@ def test_document_processing(components):
         # 获取文档目录
         docs_dir = getattr(config.paths, 'documents', './data/documents')
         
-        if not os.path.exists(docs_dir):
-            logger.warning(f"⚠️  文档目录不存在: {docs_dir}")
+        # scandir的目录项自带文件类型信息，筛选Markdown文件时无需逐个stat
+        try:
+            with os.scandir(docs_dir) as entries:
+                file_paths = [
+                    entry.path for entry in entries
+                    if entry.name.endswith('.md') and entry.is_file()
+                ]
+        except FileNotFoundError:
+            logger.warning("⚠️  文档目录不存在: %s", docs_dir)
             return False
             
-        # 处理文档
-        all_chunks = []
-        for file_name in os.listdir(docs_dir):
-            if file_name.endswith('.md'):
-                file_path = os.path.join(docs_dir, file_name)
-                chunks = doc_processor.process_document(file_path)
-                all_chunks.extend(chunks)
+        # 处理文档（分块是CPU密集型工作，用进程池并行处理所有文件）
+        all_chunks = doc_processor.process_documents(file_paths)
                 
-        logger.info(f"✅ 成功处理 {len(all_chunks)} 个文档块")
+        logger.info("✅ 成功处理 %d 个文档块", len(all_chunks))
         
         if all_chunks:
             # 显示第一个文档块的信息
             first_chunk = all_chunks[0]
-            logger.info(f"📄 示例文档: {first_chunk.source_file}")
-            logger.info(f"📝 内容长度: {len(first_chunk.content)} 字符")
+            logger.info("📄 示例文档: %s", first_chunk.source_file)
+            logger.info("📝 内容长度: %d 字符", len(first_chunk.content))
             
         return True
         
     except Exception as e:
-        logger.error(f"❌ 文档处理测试失败: {e}")
+        logger.error("❌ 文档处理测试失败: %s", e)
         return False
 
 def test_interactive_questions():
@@ -223,7 +225,7 @@ def main():
     except KeyboardInterrupt:
         print("\n测试已取消")
     except Exception as e:
-        logger.error(f"测试过程中出错: {e}")
+        logger.error("测试过程中出错: %s", e)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
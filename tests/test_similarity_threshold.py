@@ -5,120 +5,273 @@
 """
 
 import sys
+import os
 import logging
-from pathlib import Path
+import numpy as np
+from types import SimpleNamespace
+
+import pytest
 
 # 添加src目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# 嵌入模型、检索器会引入PyTorch和FAISS，只在需要它们的函数内导入
 from src.config_manager import ConfigManager
-from src.embedding_model import EmbeddingModel
-from src.retriever import RAGRetriever
+from src.document_processor import DocumentProcessor
 
-def test_similarity_threshold():
-    """测试相似度阈值过滤功能"""
-    print("=" * 60)
-    print("🧪 相似度阈值过滤功能测试")
-    print("=" * 60)
+# 本模块的测试都依赖嵌入模型，整体标记为重量级测试
+pytestmark = pytest.mark.heavy
+
+# 直接运行脚本时优先加载的主索引
+MAIN_INDEX_PATH = "data/vectors/main_index"
+
+# 主索引不存在时（以及pytest下）用于构建索引的测试文档
+TEST_DOCUMENT_PATH = "data/documents/test_document.md"
+
+# 阈值对比测试使用的阈值
+SWEEP_THRESHOLDS = (0.1, 0.3, 0.5, 0.7)
+
+# 阈值对比测试每个查询取回的结果数
+SWEEP_TOP_K = 5
+
+# 不同相关程度的测试查询
+TEST_QUERIES = [
+    {
+        "query": "什么是机器学习？",
+        "description": "高相关性查询（应该有结果）"
+    },
+    {
+        "query": "深度学习的特点",
+        "description": "中等相关性查询"
+    },
+    {
+        "query": "今天天气怎么样？",
+        "description": "低相关性查询（可能被过滤）"
+    },
+    {
+        "query": "如何做红烧肉？",
+        "description": "无关查询（应该被过滤）"
+    }
+]
+
+def build_retriever(embedding_model, index_path: str = None):
+    """
+    创建检索器并准备索引
     
-    # 设置日志
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
+    指定的索引文件存在时直接加载，否则由测试文档构建索引
+    """
+    from src.retriever import RAGRetriever
     
-    try:
-        # 1. 加载配置
-        config_manager = ConfigManager()
-        config = config_manager.load_config()
-        
-        print(f"📊 当前配置:")
-        print(f"  • 相似度阈值: {config.retrieval.similarity_threshold}")
-        print(f"  • 检索数量: {config.retrieval.top_k}")
+    retriever = RAGRetriever(embedding_model)
+    if index_path and os.path.exists(f"{index_path}.faiss"):
+        retriever.load_index(index_path)
+        print(f"✅ 已加载现有索引: {index_path}")
+    else:
+        chunks = DocumentProcessor(chunk_size=300, chunk_overlap=50).process_document(TEST_DOCUMENT_PATH)
+        retriever.vector_store.build_index(chunks)
+        print(f"✅ 已由测试文档构建索引: {TEST_DOCUMENT_PATH}")
+    return retriever
+
+@pytest.fixture(scope="module")
+def retriever(embedding_model):
+    """由测试文档构建索引的检索器，本模块的测试共享"""
+    if not os.path.isfile(TEST_DOCUMENT_PATH):
+        pytest.skip(f"测试文档不存在: {TEST_DOCUMENT_PATH}")
+    return build_retriever(embedding_model)
+
+def _result_keys(results):
+    """检索结果的(分块ID, 相似度)列表，用于比较两组结果是否一致"""
+    return [(result.chunk_id, result.score) for result in results]
+
+def count_results_per_threshold(raw_results, thresholds: np.ndarray) -> np.ndarray:
+    """
+    统计不过滤阈值的检索结果中，分数不低于各阈值的结果数
+    
+    所有阈值一次性比较：scores为一维分数数组，比较矩阵每行对应一个阈值
+    """
+    scores = np.array([result.score for result in raw_results], dtype=np.float32)
+    return np.count_nonzero(scores[None, :] >= thresholds[:, None], axis=1)
+
+def test_search_raw(retriever):
+    """search_raw只检索一次，按各阈值过滤的结果应与带阈值的检索一致"""
+    for test_case in TEST_QUERIES:
+        query = test_case["query"]
+        raw_results = retriever.search_raw(query, top_k=SWEEP_TOP_K)
         
-        # 2. 初始化服务
-        embedding_service = EmbeddingService(
-            model_name=config.embedding.model_name,
-            device=config.embedding.device
-        )
-        embedding_service.load_model()
+        scores = [result.score for result in raw_results]
+        assert len(raw_results) == min(SWEEP_TOP_K, retriever.vector_store.chunk_count), \
+            f"不过滤阈值时应返回top_k个结果: {query}"
+        assert scores == sorted(scores, reverse=True), f"结果应按相似度降序排列: {query}"
         
-        retriever = RAGRetriever(embedding_service=embedding_service)
+        for threshold in SWEEP_THRESHOLDS:
+            filtered = [result for result in raw_results if result.score >= threshold]
+            expected = retriever.search(query, top_k=SWEEP_TOP_K, similarity_threshold=threshold)
+            assert _result_keys(filtered) == _result_keys(expected), \
+                f"阈值 {threshold} 的过滤结果与带阈值检索不一致: {query}"
+
+def test_search_by_vector(retriever):
+    """查询只向量化一次，用同一个向量按不同阈值检索的结果应与按文本检索一致"""
+    for test_case in TEST_QUERIES:
+        query = test_case["query"]
+        query_vector = retriever.embedding_model.encode_texts([query])[0]
         
-        # 3. 加载现有索引
-        index_path = "data/vectors/main_index"
-        if Path(f"{index_path}.faiss").exists():
-            retriever.load_index(index_path)
-            print("✅ 已加载现有索引")
-        else:
-            print("❌ 未找到索引文件")
-            return
+        for threshold in SWEEP_THRESHOLDS:
+            by_vector = retriever.search_by_vector(query_vector, top_k=SWEEP_TOP_K, similarity_threshold=threshold)
+            by_text = retriever.search(query, top_k=SWEEP_TOP_K, similarity_threshold=threshold)
+            assert _result_keys(by_vector) == _result_keys(by_text), \
+                f"阈值 {threshold} 下按向量检索与按文本检索不一致: {query}"
+
+def test_threshold_sweep_counts(retriever):
+    """一次向量化比较统计的各阈值结果数，应与逐个阈值检索得到的结果数一致"""
+    thresholds = np.array(SWEEP_THRESHOLDS, dtype=np.float32)
+    
+    # 分数恰好等于阈值时应计入结果，与检索时的过滤条件（score >= threshold）一致
+    boundary_results = [SimpleNamespace(score=score) for score in thresholds.tolist() + [0.05, 0.9]]
+    expected = [sum(1 for result in boundary_results if result.score >= threshold)
+                for threshold in thresholds.tolist()]
+    assert count_results_per_threshold(boundary_results, thresholds).tolist() == expected, \
+        "阈值边界上的结果计数与逐个阈值过滤不一致"
+    
+    for test_case in TEST_QUERIES:
+        query = test_case["query"]
+        query_vector = retriever.embedding_model.encode_texts([query])[0]
+        raw_results = retriever.search_by_vector(query_vector, top_k=SWEEP_TOP_K, similarity_threshold=float('-inf'))
         
-        # 4. 测试不同类型的查询
-        test_queries = [
-            {
-                "query": "什么是机器学习？",
-                "description": "高相关性查询（应该有结果）"
-            },
-            {
-                "query": "深度学习的特点",
-                "description": "中等相关性查询"
-            },
-            {
-                "query": "今天天气怎么样？",
-                "description": "低相关性查询（可能被过滤）"
-            },
-            {
-                "query": "如何做红烧肉？",
-                "description": "无关查询（应该被过滤）"
-            }
+        counts = count_results_per_threshold(raw_results, thresholds)
+        expected = [
+            len(retriever.search_by_vector(query_vector, top_k=SWEEP_TOP_K, similarity_threshold=threshold))
+            for threshold in thresholds.tolist()
         ]
+        assert counts.tolist() == expected, f"各阈值结果数与逐个阈值检索不一致: {query}"
+
+def test_search_batch_by_vectors(retriever):
+    """批量向量化、一次批量检索的结果应与逐个查询向量化并检索一致"""
+    queries = [test_case["query"] for test_case in TEST_QUERIES]
+    query_vectors = retriever.embedding_model.encode_texts(queries, batch_size=len(queries))
+    
+    # 批量向量化与逐个向量化只有填充带来的浮点误差
+    single_vectors = np.vstack([retriever.embedding_model.encode_texts([query]) for query in queries])
+    assert np.allclose(query_vectors, single_vectors, atol=1e-4), "批量向量化结果与逐个向量化不一致"
+    
+    for threshold in (float('-inf'),) + SWEEP_THRESHOLDS:
+        batch_results = retriever.search_batch_by_vectors(
+            query_vectors, top_k=SWEEP_TOP_K, similarity_threshold=threshold
+        )
+        assert len(batch_results) == len(queries), "每个查询向量应对应一组结果"
+        for query, query_vector, results in zip(queries, query_vectors, batch_results):
+            expected = retriever.search_by_vector(query_vector, top_k=SWEEP_TOP_K, similarity_threshold=threshold)
+            # 批量检索用矩阵乘法、单条检索用矩阵向量乘法，分数只允许末位的舍入差异
+            assert [r.chunk_id for r in results] == [r.chunk_id for r in expected], \
+                f"阈值 {threshold} 下批量检索与逐个检索的结果不一致: {query}"
+            assert np.allclose([r.score for r in results], [r.score for r in expected], atol=1e-5), \
+                f"阈值 {threshold} 下批量检索与逐个检索的分数不一致: {query}"
+
+def test_similarity_threshold(retriever, config_manager):
+    """测试相似度阈值过滤功能"""
+    print("=" * 60)
+    print("🧪 相似度阈值过滤功能测试")
+    print("=" * 60)
+    
+    # 1. 读取配置
+    config = config_manager.get_config()
+    top_k = config.retrieval_top_k
+    similarity_threshold = config.retrieval_similarity_threshold
+    
+    print(f"📊 当前配置:")
+    print(f"  • 相似度阈值: {similarity_threshold}")
+    print(f"  • 检索数量: {top_k}")
+    
+    # 2. 测试不同类型的查询
+    print("\n🔍 开始测试不同查询的过滤效果:")
+    print("-" * 60)
+    
+    # 所有查询一次性批量向量化，再各用一次批量检索得到默认阈值和阈值对比的结果
+    query_vectors = retriever.embedding_model.encode_texts(
+        [test_case["query"] for test_case in TEST_QUERIES],
+        batch_size=len(TEST_QUERIES)
+    )
+    batch_results = retriever.search_batch_by_vectors(
+        query_vectors,
+        top_k=top_k,
+        similarity_threshold=similarity_threshold
+    )
+    batch_raw_results = retriever.search_batch_by_vectors(
+        query_vectors, top_k=SWEEP_TOP_K, similarity_threshold=float('-inf')
+    )
+    
+    for i, (test_case, results, raw_results) in enumerate(
+            zip(TEST_QUERIES, batch_results, batch_raw_results), 1):
+        query = test_case["query"]
+        description = test_case["description"]
         
-        print("\n🔍 开始测试不同查询的过滤效果:")
-        print("-" * 60)
-        
-        for i, test_case in enumerate(test_queries, 1):
-            query = test_case["query"]
-            description = test_case["description"]
-            
-            print(f"\n测试 {i}: {description}")
-            print(f"查询: {query}")
-            
-            # 使用默认阈值检索
-            results = retriever.search(
-                query, 
-                top_k=config.retrieval.top_k,
-                similarity_threshold=config.retrieval.similarity_threshold
-            )
-            
-            print(f"结果数量: {len(results)}")
-            
-            if results:
-                print("检索结果:")
-                for j, result in enumerate(results, 1):
-                    print(f"  {j}. 相似度: {result.score:.3f}")
-                    print(f"     内容: {result.content[:100]}...")
-            else:
-                print("  ❌ 无结果（被相似度阈值过滤）")
-            
-            # 测试不同阈值的效果
-            print(f"\n🔬 阈值对比测试:")
-            for threshold in [0.1, 0.3, 0.5, 0.7]:
-                test_results = retriever.search(query, top_k=5, similarity_threshold=threshold)
-                print(f"  阈值 {threshold}: {len(test_results)} 个结果")
+        print(f"\n测试 {i}: {description}")
+        print(f"查询: {query}")
         
-        print("\n" + "=" * 60)
-        print("✅ 相似度阈值过滤功能测试完成")
-        print("=" * 60)
+        assert len(results) <= top_k, f"结果数量超过top_k: {query}"
+        assert all(result.score >= similarity_threshold for result in results), \
+            f"存在低于阈值的结果: {query}"
+        print(f"结果数量: {len(results)}")
         
-        # 5. 性能建议
-        print("\n💡 配置建议:")
-        print("  • 阈值 0.1-0.3: 宽松过滤，更多结果")
-        print("  • 阈值 0.3-0.5: 平衡过滤，推荐设置")
-        print("  • 阈值 0.5-0.7: 严格过滤，高质量结果")
-        print("  • 阈值 > 0.7: 极严格过滤，可能过度限制")
+        if results:
+            print("检索结果:")
+            for j, result in enumerate(results, 1):
+                print(f"  {j}. 相似度: {result.score:.3f}")
+                print(f"     内容: {result.content[:100]}...")
+        else:
+            print("  ❌ 无结果（被相似度阈值过滤）")
         
-    except Exception as e:
-        logger.error(f"测试失败: {e}")
-        print(f"❌ 测试失败: {e}")
+        # 测试不同阈值的效果
+        # 只检索一次，再按各个阈值过滤分数
+        print(f"\n🔬 阈值对比测试:")
+        thresholds = np.array(SWEEP_THRESHOLDS, dtype=np.float32)
+        counts = count_results_per_threshold(raw_results, thresholds)
+        for threshold, count in zip(thresholds.tolist(), counts.tolist()):
+            print(f"  阈值 {threshold:.1f}: {count} 个结果")
+    
+    print("\n" + "=" * 60)
+    print("✅ 相似度阈值过滤功能测试完成")
+    print("=" * 60)
+    
+    # 3. 性能建议
+    print("\n💡 配置建议:")
+    print("  • 阈值 0.1-0.3: 宽松过滤，更多结果")
+    print("  • 阈值 0.3-0.5: 平衡过滤，推荐设置")
+    print("  • 阈值 0.5-0.7: 严格过滤，高质量结果")
+    print("  • 阈值 > 0.7: 极严格过滤，可能过度限制")
+
+def main():
+    """主测试函数：优先使用主索引，不存在时由测试文档构建索引"""
+    from src.embedding_model import EmbeddingModel
+    
+    # 设置日志
+    logging.basicConfig(level=logging.INFO)
+    
+    config_manager = ConfigManager()
+    config = config_manager.load_config()
+    
+    embedding_model = EmbeddingModel(
+        model_name=config.embedding_model_name,
+        device=config.embedding_device
+    )
+    if not embedding_model.load_model():
+        print(f"❌ 嵌入模型加载失败: {config.embedding_model_name}")
+        sys.exit(1)
+    
+    retriever = build_retriever(embedding_model, MAIN_INDEX_PATH)
+    
+    failed = False
+    for test_func, args in ((test_search_raw, (retriever,)),
+                            (test_search_by_vector, (retriever,)),
+                            (test_threshold_sweep_counts, (retriever,)),
+                            (test_search_batch_by_vectors, (retriever,)),
+                            (test_similarity_threshold, (retriever, config_manager))):
+        try:
+            test_func(*args)
+        except Exception as e:
+            failed = True
+            print(f"❌ {test_func.__name__} 失败: {e}")
+    
+    sys.exit(1 if failed else 0)
 
 if __name__ == "__main__":
-    test_similarity_threshold()
\ No newline at end of file
+    main()
@@ -9,6 +9,10 @@ import sys
 import os
 import time
 import logging
+import functools
+import numpy as np
+import faiss
+from types import SimpleNamespace
 from typing import List, Dict, Any
 
 # 添加src目录到Python路径
@@ -22,9 +26,36 @@ from src.chat_service import ChatService
 from src.config_manager import ConfigManager
 from src.document_processor import DocumentChunk
 
+# 测试文档数据：(id, 内容, 来源文件, 结束位置)，测试时按需构造为DocumentChunk
+_TEST_DOC_PAYLOAD = (
+    ("test1", "机器学习是人工智能的一个重要分支，它使计算机能够在没有明确编程的情况下学习和改进。", "test1.txt", 50),
+    ("test2", "深度学习是机器学习的一个子集，使用多层神经网络来模拟人脑的工作方式。", "test2.txt", 40),
+    ("test3", "自然语言处理（NLP）是人工智能的一个领域，专注于计算机与人类语言之间的交互。", "test3.txt", 45),
+)
+
+class StubLLMClient:
+    """
+    OpenAI兼容的API客户端桩
+    
+    流式返回提示词中的内容，不发起网络请求，使对话相关测试只衡量检索流程
+    """
+    
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    @staticmethod
+    def _create(messages, stream=False, **kwargs):
+        content = "[stub] " + messages[-1]["content"][:100]
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
 class RAGTestSuite:
     """RAG系统核心测试套件"""
     
+    # 各项测试共享的嵌入模型（模型只读，加载一次即可）
+    _shared_model = None
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.test_results = {}
@@ -39,49 +70,85 @@ class RAGTestSuite:
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         
-        # 准备测试数据
-        self.test_documents = [
-            DocumentChunk(
-                id="test1",
-                content="机器学习是人工智能的一个重要分支，它使计算机能够在没有明确编程的情况下学习和改进。",
-                metadata={"source": "test1.txt"},
-                source_file="test1.txt",
-                chunk_index=0,
-                start_pos=0,
-                end_pos=50
-            ),
-            DocumentChunk(
-                id="test2",
-                content="深度学习是机器学习的一个子集，使用多层神经网络来模拟人脑的工作方式。",
-                metadata={"source": "test2.txt"},
-                source_file="test2.txt",
-                chunk_index=0,
-                start_pos=0,
-                end_pos=40
-            ),
+        self.test_questions = [
+            "什么是机器学习？",
+            "深度学习和机器学习有什么关系？",
+            "NLP是什么？"
+        ]
+        
+        # 嵌入模型只加载一次，测试文档一次性批量向量化，各项测试复用同一份向量
+        self.model = self._get_model()
+        # 模型加载失败时，依赖模型的各项测试直接跳过，不再逐个重试加载
+        self._model_broken = not self.model.is_loaded()
+        self._embeddings = None
+        if not self._model_broken:
+            self._embeddings = self.model.encode_texts(
+                [chunk.content for chunk in self.test_documents],
+                batch_size=len(self.test_documents)
+            )
+        self._shared_retriever = None
+    
+    @functools.cached_property
+    def test_documents(self) -> List[DocumentChunk]:
+        """测试文档分块，首次访问时由_TEST_DOC_PAYLOAD构造，之后复用"""
+        return [
             DocumentChunk(
-                id="test3",
-                content="自然语言处理（NLP）是人工智能的一个领域，专注于计算机与人类语言之间的交互。",
-                metadata={"source": "test3.txt"},
-                source_file="test3.txt",
+                id=doc_id,
+                content=content,
+                metadata={"source": source_file},
+                source_file=source_file,
                 chunk_index=0,
                 start_pos=0,
-                end_pos=45
+                end_pos=end_pos
             )
+            for doc_id, content, source_file, end_pos in _TEST_DOC_PAYLOAD
         ]
+    
+    @classmethod
+    def _get_model(cls) -> EmbeddingModel:
+        """获取共享的嵌入模型，首次调用时创建并加载"""
+        if cls._shared_model is None:
+            cls._shared_model = EmbeddingModel()
+            cls._shared_model.load_model()
+        return cls._shared_model
+    
+    def _get_shared_retriever(self) -> RAGRetriever:
+        """
+        获取各项测试共享的检索器，首次调用时用预先计算的向量构建索引
         
-        self.test_questions = [
-            "什么是机器学习？",
-            "深度学习和机器学习有什么关系？",
-            "NLP是什么？"
-        ]
+        检索器相关测试只读取索引，不修改状态，因此可以共用同一个实例
+        """
+        if self._shared_retriever is None:
+            retriever = RAGRetriever(self.model)
+            self._make_prebuilt_store(retriever.vector_store)
+            self._shared_retriever = retriever
+        return self._shared_retriever
+    
+    def _record(self, test_name: str, passed: bool):
+        """记录单项测试结果"""
+        self.test_results[test_name] = passed
+    
+    def _skip_if_model_broken(self, test_name: str) -> bool:
+        """嵌入模型不可用时将测试记为失败并跳过，返回是否跳过"""
+        if not self._model_broken:
+            return False
+        self._record(test_name, False)
+        print(f"⏭️ 跳过 {test_name}: 嵌入模型加载失败")
+        return True
+    
+    def _make_prebuilt_store(self, store: VectorStore = None) -> VectorStore:
+        """用预先计算的测试文档向量构建索引，跳过重复的向量化"""
+        if self._embeddings is None:
+            raise ValueError("测试文档向量未生成，请检查嵌入模型是否加载成功")
+        store = store or VectorStore(self.model)
+        store.build_index_from_embeddings(self.test_documents, self._embeddings)
+        return store
         
     def test_embedding_model(self):
         """测试嵌入模型"""
         print("\n📊 测试嵌入模型...")
         try:
-            model = EmbeddingModel()
-            model.load_model()  # 需要先加载模型
+            model = self._get_model()
             
             # 测试文本嵌入
             test_texts = ["这是一个测试文本"]
@@ -92,23 +159,22 @@ class RAGTestSuite:
             assert embeddings.shape[0] == 1, "应该有一个嵌入向量"
             assert embeddings.shape[1] > 0, "嵌入向量维度应该大于0"
             
-            self.test_results['embedding_model'] = True
+            self._record('embedding_model', True)
             print("✅ 嵌入模型测试通过")
             
         except Exception as e:
-            self.test_results['embedding_model'] = False
+            self._model_broken = True
+            self._record('embedding_model', False)
             print(f"❌ 嵌入模型测试失败: {e}")
             
     def test_vector_store(self):
         """测试向量存储"""
         print("\n🗄️ 测试向量存储...")
+        if self._skip_if_model_broken('vector_store'):
+            return
         try:
-            model = EmbeddingModel()
-            model.load_model()  # 需要先加载模型
-            store = VectorStore(model)
-            
             # 构建索引
-            store.build_index(self.test_documents)
+            store = self._make_prebuilt_store()
             
             # 测试检索
             results = store.search("机器学习", top_k=2)
@@ -117,114 +183,197 @@ class RAGTestSuite:
             assert hasattr(results[0], 'content'), "检索结果应该包含content属性"
             assert hasattr(results[0], 'score'), "检索结果应该包含score属性"
             
-            self.test_results['vector_store'] = True
+            # IVF索引：文档较少时保留Flat索引，达到IVF_MIN_VECTORS后训练为IVF-Flat
+            small_store = self._make_prebuilt_store(VectorStore(self.model, index_type="ivf"))
+            assert isinstance(small_store.index, faiss.IndexFlat), "少量文档应使用Flat索引"
+            
+            rng = np.random.default_rng(0)
+            vectors = rng.standard_normal((2000, self._embeddings.shape[1])).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            chunks = [
+                DocumentChunk(id=f"ivf{i}", content=f"IVF测试分块{i}", metadata={}, source_file="ivf.txt",
+                              chunk_index=i, start_pos=0, end_pos=0)
+                for i in range(len(vectors))
+            ]
+            ivf_store = VectorStore(self.model, index_type="ivf")
+            ivf_store.build_index_from_embeddings(chunks, vectors)
+            assert isinstance(ivf_store.index, faiss.IndexIVFFlat), "大量文档应使用IVF-Flat索引"
+            ivf_results = ivf_store.search_by_vector(vectors[42], top_k=1)
+            assert ivf_results and ivf_results[0].chunk_id == "ivf42", "IVF索引应能检索到原向量"
+            
+            self._record('vector_store', True)
             print("✅ 向量存储测试通过")
             
         except Exception as e:
-            self.test_results['vector_store'] = False
+            self._record('vector_store', False)
             print(f"❌ 向量存储测试失败: {e}")
             
+    def test_vector_store_fp16(self):
+        """测试fp16标量量化索引与fp32索引的检索一致性"""
+        print("\n🗜️ 测试fp16向量存储...")
+        if self._skip_if_model_broken('vector_store_fp16'):
+            return
+        try:
+            fp32_store = self._make_prebuilt_store(VectorStore(self.model, index_type="flat"))
+            fp16_store = self._make_prebuilt_store(VectorStore(self.model, index_type="sqfp16"))
+            
+            # 对每个测试问题，fp16索引中每个分块的相似度应与fp32索引接近，
+            # 且fp16检索到的最佳结果与fp32的最佳结果相似度相当（分数几乎相同的结果允许换序）
+            top_k = len(self.test_documents)
+            fp32_batches = fp32_store.search_batch(self.test_questions, top_k=top_k, similarity_threshold=-1.0)
+            fp16_batches = fp16_store.search_batch(self.test_questions, top_k=top_k, similarity_threshold=-1.0)
+            for question, fp32_results, fp16_results in zip(self.test_questions, fp32_batches, fp16_batches):
+                fp32_scores = {r.chunk_id: r.score for r in fp32_results}
+                assert len(fp16_results) == len(fp32_results), f"fp16索引结果数量与fp32不一致: {question}"
+                for result in fp16_results:
+                    assert abs(result.score - fp32_scores[result.chunk_id]) < 1e-2, \
+                        f"fp16相似度偏差过大: {question}"
+                assert fp32_scores[fp16_results[0].chunk_id] >= fp32_results[0].score - 1e-2, \
+                    f"fp16索引的最佳结果与fp32不一致: {question}"
+            
+            self._record('vector_store_fp16', True)
+            print("✅ fp16向量存储测试通过")
+            
+        except Exception as e:
+            self._record('vector_store_fp16', False)
+            print(f"❌ fp16向量存储测试失败: {e}")
+            
     def test_retriever(self):
         """测试检索器"""
         print("\n🔍 测试检索器...")
+        if self._skip_if_model_broken('retriever'):
+            return
         try:
-            model = EmbeddingModel()
-            model.load_model()  # 需要先加载模型
-            retriever = RAGRetriever(model)  # 只传入embedding_model
-            
-            # 构建索引
-            retriever.vector_store.build_index(self.test_documents)
+            retriever = self._get_shared_retriever()
             
             # 测试检索
             results = retriever.search("深度学习", top_k=2)
             
             assert len(results) > 0, "检索结果不能为空"
             
-            self.test_results['retriever'] = True
+            self._record('retriever', True)
             print("✅ 检索器测试通过")
             
         except Exception as e:
-            self.test_results['retriever'] = False
+            self._record('retriever', False)
             print(f"❌ 检索器测试失败: {e}")
             
     def test_chat_service(self):
         """测试对话服务"""
         print("\n💬 测试对话服务...")
+        if self._skip_if_model_broken('chat_service'):
+            return
         try:
-            # 初始化配置管理器
+            # 初始化配置管理器（使用API客户端桩，不调用真实的大模型）
             config_manager = ConfigManager()
-            chat_service = ChatService(config_manager)
+            chat_service = ChatService(config_manager, llm_client=StubLLMClient())
             
-            # 初始化检索器
-            model = EmbeddingModel()
-            model.load_model()
-            retriever = RAGRetriever(model)
-            retriever.vector_store.build_index(self.test_documents)
+            # 获取共享检索器
+            retriever = self._get_shared_retriever()
             
             # 测试对话流
-            response_chunks = []
+            # 只统计流式片段数量和是否有内容，不拼接完整回答
+            chunk_count = 0
+            has_content = False
             for chunk in chat_service.generate_answer_stream("什么是机器学习？", retriever):
                 if chunk.get('type') == 'chunk':
-                    response_chunks.append(chunk.get('content', ''))
+                    chunk_count += 1
+                    has_content = has_content or bool(chunk.get('content'))
             
-            response = "".join(response_chunks)
+            assert chunk_count > 0 and has_content, "对话响应不能为空"
             
-            assert len(response_chunks) > 0 or response is not None, "对话响应不能为空"
-            
-            self.test_results['chat_service'] = True
+            self._record('chat_service', True)
             print("✅ 对话服务测试通过")
             
         except Exception as e:
-            self.test_results['chat_service'] = False
+            self._record('chat_service', False)
             print(f"❌ 对话服务测试失败: {e}")
             
     def test_integration(self):
         """集成测试"""
         print("\n🔗 集成测试...")
+        if self._skip_if_model_broken('integration'):
+            return
         try:
-            # 完整流程测试
+            # 完整流程测试（使用API客户端桩，真实API由test_live_api覆盖）
             config_manager = ConfigManager()
-            chat_service = ChatService(config_manager)
+            chat_service = ChatService(config_manager, llm_client=StubLLMClient())
             
-            model = EmbeddingModel()
-            model.load_model()
-            retriever = RAGRetriever(model)
-            retriever.vector_store.build_index(self.test_documents)
+            retriever = self._get_shared_retriever()
             
             # 端到端测试
-            response_chunks = []
+            # 只统计流式片段数量和是否有内容，不拼接完整回答
+            chunk_count = 0
+            has_content = False
             for chunk in chat_service.generate_answer_stream("什么是深度学习？", retriever):
                 if chunk.get('type') == 'chunk':
-                    response_chunks.append(chunk.get('content', ''))
-            
-            response = "".join(response_chunks)
+                    chunk_count += 1
+                    has_content = has_content or bool(chunk.get('content'))
             
-            assert len(response_chunks) > 0 or response is not None, "集成测试响应不能为空"
+            assert chunk_count > 0 and has_content, "集成测试响应不能为空"
             
-            self.test_results['integration'] = True
+            self._record('integration', True)
             print("✅ 集成测试通过")
             
         except Exception as e:
-            self.test_results['integration'] = False
+            self._record('integration', False)
             print(f"❌ 集成测试失败: {e}")
             
-    def run_all_tests(self):
-        """运行所有测试"""
+    def test_live_api(self):
+        """调用真实大模型API的端到端测试（较慢，需要配置API密钥）"""
+        print("\n🌐 真实API测试...")
+        if self._skip_if_model_broken('live_api'):
+            return
+        try:
+            config_manager = ConfigManager()
+            chat_service = ChatService(config_manager)
+            
+            retriever = self._get_shared_retriever()
+            
+            chunk_count = 0
+            for chunk in chat_service.generate_answer_stream("什么是深度学习？", retriever):
+                if chunk.get('type') == 'chunk':
+                    chunk_count += 1
+            
+            assert chunk_count > 0, "真实API响应不能为空"
+            
+            self._record('live_api', True)
+            print("✅ 真实API测试通过")
+            
+        except Exception as e:
+            self._record('live_api', False)
+            print(f"❌ 真实API测试失败: {e}")
+            
+    def run_all_tests(self, live: bool = False):
+        """
+        运行所有测试
+        
+        Args:
+            live: 是否运行调用真实大模型API的测试，默认为False
+        """
         print("🧪 RAG系统核心测试套件")
         print("=" * 60)
         
         # 设置测试环境
         self.setup_test_environment()
         
-        # 运行各项测试
-        self.test_embedding_model()
-        self.test_vector_store()
-        self.test_retriever()
-        self.test_chat_service()
-        self.test_integration()
+        # 依次运行各项测试：向量存储的查询缓存、PyTorch和FAISS的全局线程数等共享状态
+        # 不是线程安全的，测试不能并行执行
+        tests = [
+            self.test_embedding_model,
+            self.test_vector_store,
+            self.test_vector_store_fp16,
+            self.test_retriever,
+            self.test_chat_service,
+            self.test_integration,
+        ]
+        if live:
+            tests.append(self.test_live_api)
+        for test in tests:
+            test()
         
         # 输出测试结果
-        self.print_test_summary()
+        return self.print_test_summary()
         
     def print_test_summary(self):
         """打印测试摘要"""
@@ -254,7 +403,8 @@ class RAGTestSuite:
 def main():
     """主函数"""
     test_suite = RAGTestSuite()
-    success = test_suite.run_all_tests()
+    # 传入--live时额外运行调用真实API的测试
+    success = test_suite.run_all_tests(live="--live" in sys.argv)
     
     # 返回适当的退出码
     sys.exit(0 if success else 1)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量存储索引类型测试脚本
+
+用随机单位向量直接构建索引（build_index_from_embeddings），不加载嵌入模型
+"""
+
+import sys
+import os
+import gc
+import weakref
+
+import numpy as np
+import faiss
+import pytest
+
+# 添加src目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.vector_store import VectorStore, HNSW_THRESHOLD, KMEANS_MIN_POINTS_PER_CENTROID
+from src.document_processor import DocumentChunk
+
+# 随机测试向量的数量和维度（维度取得较小，PQ码本训练耗时随子空间数增长）
+NUM_VECTORS = 2000
+DIMENSION = 64
+
+# IVF-PQ测试索引的聚类数和PQ子空间数
+PQ_NLIST = 32
+PQ_M = 8
+
+def random_unit_vectors(n: int, d: int, seed: int = 0) -> np.ndarray:
+    """生成n个d维的随机单位向量"""
+    vectors = np.random.default_rng(seed).standard_normal((n, d)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def make_chunks(n: int, prefix: str = "vec") -> list:
+    """构造n个与向量一一对应的分块，分块ID为prefix加行号"""
+    return [
+        DocumentChunk(id=f"{prefix}{i}", content=f"测试分块{i}", metadata={}, source_file=f"{prefix}.txt",
+                      chunk_index=i, start_pos=0, end_pos=0)
+        for i in range(n)
+    ]
+
+def build_store(vectors: np.ndarray, **kwargs) -> VectorStore:
+    """不加载嵌入模型，直接用向量构建指定类型的向量存储"""
+    store = VectorStore(None, **kwargs)
+    store.build_index_from_embeddings(make_chunks(len(vectors)), vectors)
+    return store
+
+def self_recall(store: VectorStore, vectors: np.ndarray, top_k: int) -> float:
+    """以库内向量作为查询，原向量出现在前top_k个结果中的比例"""
+    batches = store.search_batch_by_vectors(vectors, top_k=top_k, similarity_threshold=-1.0)
+    return float(np.mean([f"vec{i}" in {r.chunk_id for r in results} for i, results in enumerate(batches)]))
+
+@pytest.fixture(scope="module")
+def vectors() -> np.ndarray:
+    return random_unit_vectors(NUM_VECTORS, DIMENSION)
+
+@pytest.fixture(scope="module")
+def flat_store(vectors) -> VectorStore:
+    return build_store(vectors, index_type="flat")
+
+@pytest.fixture(scope="module")
+def pq_store(vectors) -> VectorStore:
+    return build_store(vectors, index_type="ivfpq", pq_nlist=PQ_NLIST, pq_m=PQ_M)
+
+@pytest.fixture(scope="module")
+def hnsw_store(vectors) -> VectorStore:
+    return build_store(vectors, index_type="hnsw")
+
+def test_unnormalized_embeddings_are_normalized(vectors):
+    """未归一化的向量入库时统一L2归一化，且不修改传入的数组"""
+    scaled = vectors * 3.0
+    store = build_store(scaled, index_type="flat")
+    assert np.allclose(np.linalg.norm(store.index.reconstruct_n(0, len(vectors)), axis=1), 1.0, atol=1e-5)
+    assert np.array_equal(scaled, vectors * 3.0), "传入的向量数组不应被修改"
+
+def test_normalized_embeddings_are_stored_as_is(vectors):
+    """声明已归一化的向量直接入库，不再重复归一化"""
+    store = VectorStore(None, index_type="flat")
+    store.build_index_from_embeddings(make_chunks(len(vectors)), vectors, normalized=True)
+    assert np.array_equal(store.index.reconstruct_n(0, len(vectors)), vectors)
+
+def test_save_over_mapped_index(tmp_path):
+    """覆盖保存已被映射加载的索引文件时，已加载的向量存储仍可检索，重新加载得到新索引"""
+    index_path = str(tmp_path / "index")
+    old_vectors = random_unit_vectors(5000, DIMENSION)
+    build_store(old_vectors, index_type="flat").save_index(index_path)
+    mapped = VectorStore(None, index_type="flat")
+    mapped.load_index(index_path)
+    
+    build_store(random_unit_vectors(1000, DIMENSION, seed=1), index_type="flat").save_index(index_path)
+    
+    # 原地截断重写映射中的文件会使这里的检索触发SIGBUS
+    results = mapped.search_batch_by_vectors(old_vectors[-10:], top_k=1, similarity_threshold=-1.0)
+    assert [r[0].chunk_id for r in results] == [f"vec{i}" for i in range(4990, 5000)]
+    
+    reloaded = VectorStore(None, index_type="flat")
+    reloaded.load_index(index_path)
+    assert reloaded.index is not mapped.index and reloaded.index.ntotal == 1000
+
+def test_mapped_index_released_with_last_store(tmp_path):
+    """映射加载的索引由多个向量存储共享，最后一个向量存储释放后索引（及其映射）随之释放"""
+    index_path = str(tmp_path / "index")
+    build_store(random_unit_vectors(5000, DIMENSION), index_type="flat").save_index(index_path)
+    first = VectorStore(None, index_type="flat")
+    second = VectorStore(None, index_type="flat")
+    first.load_index(index_path)
+    second.load_index(index_path)
+    assert first.index is second.index
+    
+    index_ref = weakref.ref(first.index)
+    del first
+    gc.collect()
+    assert index_ref() is not None, "仍有向量存储使用时索引不应释放"
+    del second
+    gc.collect()
+    assert index_ref() is None, "没有向量存储使用后索引应被释放"
+
+def test_mapped_index_search_settings_are_per_store(vectors, tmp_path):
+    """映射加载同一索引文件的两个向量存储共享索引对象，各自的nprobe互不影响"""
+    build_store(vectors, index_type="ivf").save_index(str(tmp_path / "ivf"))
+    narrow = VectorStore(None, index_type="ivf")
+    wide = VectorStore(None, index_type="ivf")
+    narrow.load_index(str(tmp_path / "ivf"))
+    wide.load_index(str(tmp_path / "ivf"))
+    assert narrow.index is wide.index
+    
+    nlist = faiss.try_extract_index_ivf(wide.index).nlist
+    narrow.nprobe = 1
+    wide.nprobe = nlist
+    noise = np.random.default_rng(2).standard_normal((100, DIMENSION)).astype(np.float32)
+    queries = vectors[:100] + 0.2 * noise
+    
+    def result_ids(store, **kwargs):
+        batches = store.search_batch_by_vectors(queries, top_k=5, similarity_threshold=-1.0, **kwargs)
+        return [[r.chunk_id for r in results] for results in batches]
+    
+    assert result_ids(narrow) == result_ids(narrow, nprobe=1)
+    assert result_ids(wide) == result_ids(wide, nprobe=nlist)
+    assert result_ids(narrow) != result_ids(wide), "nprobe不同时检索结果应有差异"
+
+def test_ivfpq_index_type(pq_store):
+    """向量数足够训练时，ivfpq类型应构建IVF-PQ索引"""
+    assert isinstance(pq_store.index, faiss.IndexIVFPQ)
+    assert pq_store.index.nlist == PQ_NLIST
+    assert pq_store.index.pq.M == PQ_M
+
+def test_ivfpq_index_file_smaller_than_flat(flat_store, pq_store, tmp_path):
+    """IVF-PQ索引文件应明显小于保存fp32向量的Flat索引文件"""
+    flat_store.save_index(str(tmp_path / "flat"))
+    pq_store.save_index(str(tmp_path / "pq"))
+    flat_size = (tmp_path / "flat.faiss").stat().st_size
+    pq_size = (tmp_path / "pq.faiss").stat().st_size
+    assert pq_size < flat_size / 2, f"IVF-PQ索引 {pq_size} 字节，Flat索引 {flat_size} 字节"
+
+def test_ivfpq_recall(pq_store, vectors):
+    """IVF-PQ索引中，原向量出现在前2个结果中的比例不低于0.9"""
+    recall = self_recall(pq_store, vectors[:100], top_k=2)
+    assert recall >= 0.9, f"IVF-PQ索引召回率过低: {recall:.2f}"
+
+def test_ivfpq_requires_enough_training_vectors():
+    """向量数少于39·nlist时训练数据不足，ivfpq类型应保留暴力搜索索引"""
+    n = KMEANS_MIN_POINTS_PER_CENTROID * PQ_NLIST - 1
+    store = build_store(random_unit_vectors(n, DIMENSION), index_type="ivfpq", pq_nlist=PQ_NLIST, pq_m=PQ_M)
+    assert faiss.try_extract_index_ivf(store.index) is None, f"{n} 个向量不应训练nlist={PQ_NLIST}的IVF-PQ索引"
+
+@pytest.mark.parametrize("top_k", [1, 5, 10])
+def test_hnsw_recall(flat_store, hnsw_store, vectors, top_k):
+    """HNSW索引对带噪声查询的召回率（与Flat索引的精确结果相比）不低于0.95"""
+    noise = np.random.default_rng(1).standard_normal((100, DIMENSION)).astype(np.float32)
+    queries = vectors[:100] + 0.05 * noise
+    exact = flat_store.search_batch_by_vectors(queries, top_k=top_k, similarity_threshold=-1.0)
+    approx = hnsw_store.search_batch_by_vectors(queries, top_k=top_k, similarity_threshold=-1.0)
+    hits = sum(len({r.chunk_id for r in a} & {r.chunk_id for r in e}) for a, e in zip(approx, exact))
+    recall = hits / (top_k * len(queries))
+    assert recall >= 0.95, f"HNSW索引召回率过低: top_k={top_k}, recall={recall:.3f}"
+
+def test_auto_index_keeps_brute_force_up_to_hnsw_threshold():
+    """auto类型在向量数不超过HNSW_THRESHOLD时保留SQfp16暴力搜索索引"""
+    store = build_store(random_unit_vectors(HNSW_THRESHOLD, 16), index_type="auto")
+    assert isinstance(store.index, faiss.IndexScalarQuantizer)
+
+def test_auto_index_uses_hnsw_above_hnsw_threshold():
+    """auto类型在向量数超过HNSW_THRESHOLD时转换为HNSW索引"""
+    store = build_store(random_unit_vectors(HNSW_THRESHOLD + 1, 16), index_type="auto")
+    assert isinstance(store.index, faiss.IndexHNSW)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))